@@ -0,0 +1,57 @@
+# ==============================
+# STUDENT ANALYTICS SNAPSHOT
+# ==============================
+# StudentAnalytics is the denormalized, read-side snapshot: dashboards read
+# one row instead of re-aggregating TestAttempt history on every request.
+# It is refreshed here, once per submission event, off the render path.
+
+from datetime import datetime
+
+from extensions import db
+from models import Chapter, StudentAnalytics, Test, TestAttempt, TopicPerformance
+
+
+def refresh_student_analytics(student_id, class_id):
+    """Recompute the StudentAnalytics snapshot for one student in one class."""
+    avg_score = (
+        db.session.query(db.func.avg(TestAttempt.score))
+        .join(Test, TestAttempt.test_id == Test.id)
+        .join(Chapter, Test.chapter_id == Chapter.id)
+        .filter(TestAttempt.student_id == student_id, Chapter.class_id == class_id)
+        .scalar()
+    ) or 0.0
+
+    topic_rows = (
+        db.session.query(
+            TopicPerformance.topic,
+            db.func.sum(TopicPerformance.correct),
+            db.func.sum(TopicPerformance.total),
+        )
+        .join(TestAttempt, TopicPerformance.attempt_id == TestAttempt.id)
+        .join(Test, TestAttempt.test_id == Test.id)
+        .join(Chapter, Test.chapter_id == Chapter.id)
+        .filter(TestAttempt.student_id == student_id, Chapter.class_id == class_id)
+        .group_by(TopicPerformance.topic)
+        .all()
+    )
+
+    weak_topics, strong_topics = [], []
+    for topic, correct, total in topic_rows:
+        if total and (correct or 0) / total >= 0.5:
+            strong_topics.append(topic)
+        else:
+            weak_topics.append(topic)
+
+    analytics = StudentAnalytics.query.filter_by(
+        student_id=student_id, class_id=class_id
+    ).first()
+    if not analytics:
+        analytics = StudentAnalytics(student_id=student_id, class_id=class_id)
+        db.session.add(analytics)
+
+    analytics.overall_score = round(float(avg_score), 2)
+    analytics.weak_topics = weak_topics
+    analytics.strong_topics = strong_topics
+    analytics.last_updated = datetime.utcnow()
+    db.session.commit()
+    return analytics
@@ -15,6 +15,15 @@ app.secret_key = "dev_secret_key"  # Change for production
 # Database setup
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///edusmart.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Proctoring clients hit /student/analyze_frame every few seconds during a
+# test; the default pool (5 + 10 overflow) serializes under one full class.
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    "pool_size": 20,
+    "max_overflow": 40,
+    "pool_timeout": 30,
+    "pool_recycle": 3600,
+    "pool_pre_ping": True,
+}
 
 # Initialize DB
 db.init_app(app)
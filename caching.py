@@ -0,0 +1,33 @@
+# ==============================
+# PER-REQUEST QUERY CACHE
+# ==============================
+# Test rows are effectively immutable while a student is taking or reviewing
+# a test, yet the answer-save endpoint used to re-SELECT them on every call.
+# This helper keeps a per-request dict on flask.g (dropped automatically at
+# request teardown, so teacher edits are picked up on the next request) and
+# leans on the session identity map for primary-key gets.
+
+from flask import g
+
+from extensions import db
+from models import Test
+
+
+def _bucket(name):
+    cache = getattr(g, "_query_cache", None)
+    if cache is None:
+        cache = g._query_cache = {}
+    return cache.setdefault(name, {})
+
+
+def _get_cached(model, bucket_name, obj_id):
+    if obj_id is None:
+        return None
+    bucket = _bucket(bucket_name)
+    if obj_id not in bucket:
+        bucket[obj_id] = db.session.get(model, obj_id)
+    return bucket[obj_id]
+
+
+def get_test(test_id):
+    return _get_cached(Test, "test", test_id)
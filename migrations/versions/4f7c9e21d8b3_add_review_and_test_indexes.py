@@ -0,0 +1,34 @@
+"""Add indexes on student_review (student_id, test_id) and test.chapter_id
+
+Revision ID: 4f7c9e21d8b3
+Revises: e8d41b7c6a29
+Create Date: 2025-11-07 13:05:02.284756
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4f7c9e21d8b3'
+down_revision = 'e8d41b7c6a29'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The report preload filters student_review by (student_id, test_id);
+    # chapter/class rollups join test through chapter_id.
+    with op.batch_alter_table('student_review', schema=None) as batch_op:
+        batch_op.create_index('ix_student_review_student_test', ['student_id', 'test_id'], unique=False)
+
+    with op.batch_alter_table('test', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_test_chapter_id'), ['chapter_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('test', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_test_chapter_id'))
+
+    with op.batch_alter_table('student_review', schema=None) as batch_op:
+        batch_op.drop_index('ix_student_review_student_test')
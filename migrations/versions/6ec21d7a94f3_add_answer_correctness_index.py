@@ -0,0 +1,28 @@
+"""Add composite index on student_answer (attempt_id, is_correct)
+
+Revision ID: 6ec21d7a94f3
+Revises: b16f98d240c7
+Create Date: 2025-11-07 10:12:55.418220
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6ec21d7a94f3'
+down_revision = 'b16f98d240c7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The submit-path tallies aggregate student_answer filtered by attempt_id
+    # and is_correct; this covering index lets them run as index-only scans.
+    with op.batch_alter_table('student_answer', schema=None) as batch_op:
+        batch_op.create_index('ix_student_answer_attempt_correct', ['attempt_id', 'is_correct'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('student_answer', schema=None) as batch_op:
+        batch_op.drop_index('ix_student_answer_attempt_correct')
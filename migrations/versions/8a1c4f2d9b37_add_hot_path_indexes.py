@@ -0,0 +1,53 @@
+"""Add indexes for hot attempt/answer/follow-up lookups
+
+Revision ID: 8a1c4f2d9b37
+Revises: 22fca83fb8e0
+Create Date: 2025-11-03 10:42:08.119254
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8a1c4f2d9b37'
+down_revision = '22fca83fb8e0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Non-PK foreign keys are not indexed automatically on SQLite/MySQL, so
+    # every per-attempt lookup scans the full table without these.
+    # Keep all DDL for one table inside a single batch_alter_table block:
+    # SQLite's batch mode recreates the whole table per block, so splitting
+    # a table across blocks multiplies the rewrite cost.
+    with op.batch_alter_table('student_answer', schema=None) as batch_op:
+        batch_op.create_index('ix_student_answer_attempt_id', ['attempt_id'], unique=False)
+        batch_op.create_index('ix_student_answer_question_id', ['question_id'], unique=False)
+        batch_op.create_index('ix_student_answer_attempt_question', ['attempt_id', 'question_id'], unique=True)
+
+    with op.batch_alter_table('test_attempt', schema=None) as batch_op:
+        batch_op.create_index('ix_test_attempt_test_id', ['test_id'], unique=False)
+        batch_op.create_index('ix_test_attempt_student_id', ['student_id'], unique=False)
+        batch_op.create_index('ix_test_attempt_student_test', ['student_id', 'test_id'], unique=False)
+
+    with op.batch_alter_table('followup_assignment', schema=None) as batch_op:
+        batch_op.create_index('ix_followup_assignment_attempt_id', ['attempt_id'], unique=False)
+        batch_op.create_index('ix_followup_assignment_student_topic', ['student_id', 'topic_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('followup_assignment', schema=None) as batch_op:
+        batch_op.drop_index('ix_followup_assignment_student_topic')
+        batch_op.drop_index('ix_followup_assignment_attempt_id')
+
+    with op.batch_alter_table('test_attempt', schema=None) as batch_op:
+        batch_op.drop_index('ix_test_attempt_student_test')
+        batch_op.drop_index('ix_test_attempt_student_id')
+        batch_op.drop_index('ix_test_attempt_test_id')
+
+    with op.batch_alter_table('student_answer', schema=None) as batch_op:
+        batch_op.drop_index('ix_student_answer_attempt_question')
+        batch_op.drop_index('ix_student_answer_question_id')
+        batch_op.drop_index('ix_student_answer_attempt_id')
@@ -0,0 +1,28 @@
+"""Add composite index on proctoring_log (attempt_id, timestamp)
+
+Revision ID: 9b3a52c8e1f0
+Revises: 6ec21d7a94f3
+Create Date: 2025-11-07 11:03:41.902174
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b3a52c8e1f0'
+down_revision = '6ec21d7a94f3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Proctoring log reads are always scoped to one attempt and ordered by
+    # timestamp; the composite index serves both the filter and the sort.
+    with op.batch_alter_table('proctoring_log', schema=None) as batch_op:
+        batch_op.create_index('ix_proc_attempt_ts', ['attempt_id', 'timestamp'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('proctoring_log', schema=None) as batch_op:
+        batch_op.drop_index('ix_proc_attempt_ts')
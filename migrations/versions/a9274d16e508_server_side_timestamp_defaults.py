@@ -0,0 +1,45 @@
+"""Move timestamp defaults server-side
+
+Revision ID: a9274d16e508
+Revises: f51e7a20c694
+Create Date: 2025-11-04 15:02:47.336190
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9274d16e508'
+down_revision = 'f51e7a20c694'
+branch_labels = None
+depends_on = None
+
+# (table, column) pairs whose default moves from Python datetime.utcnow to
+# the database clock; bulk inserts can then omit the column entirely.
+_TIMESTAMP_COLUMNS = [
+    ('student_class', 'joined_at'),
+    ('test', 'start_time'),
+    ('test_attempt', 'attempted_at'),
+    ('assignment_submission', 'submitted_at'),
+    ('student_analytics', 'last_updated'),
+    ('proctoring_log', 'timestamp'),
+    ('stress_log', 'timestamp'),
+    ('followup_assignment', 'created_at'),
+    ('recommended_video', 'created_at'),
+    ('student_review', 'reviewed_on'),
+]
+
+
+def upgrade():
+    for table, column in _TIMESTAMP_COLUMNS:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column(column, existing_type=sa.DateTime(),
+                                  server_default=sa.func.now())
+
+
+def downgrade():
+    for table, column in _TIMESTAMP_COLUMNS:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column(column, existing_type=sa.DateTime(),
+                                  server_default=None)
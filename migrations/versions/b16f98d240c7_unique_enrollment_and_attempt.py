@@ -0,0 +1,37 @@
+"""Enforce unique enrollments and one attempt per student/test
+
+Revision ID: b16f98d240c7
+Revises: e4f06c2b87d1
+Create Date: 2025-11-06 09:21:40.655718
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b16f98d240c7'
+down_revision = 'e4f06c2b87d1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The routes already treat enrollment and attempts as one-per-pair
+    # (filter_by(...).first()); these constraints make the DB agree and give
+    # the planner covering unique indexes for the hottest lookups.
+    with op.batch_alter_table('student_class', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_student_class', ['student_id', 'class_id'])
+
+    with op.batch_alter_table('test_attempt', schema=None) as batch_op:
+        batch_op.drop_index('ix_test_attempt_student_test')
+        batch_op.create_index('ix_test_attempt_student_test', ['student_id', 'test_id'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('test_attempt', schema=None) as batch_op:
+        batch_op.drop_index('ix_test_attempt_student_test')
+        batch_op.create_index('ix_test_attempt_student_test', ['student_id', 'test_id'], unique=False)
+
+    with op.batch_alter_table('student_class', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_student_class', type_='unique')
@@ -0,0 +1,42 @@
+"""Add normalized topic_performance table
+
+Revision ID: c3d90b514e82
+Revises: 8a1c4f2d9b37
+Create Date: 2025-11-03 14:27:51.902317
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3d90b514e82'
+down_revision = '8a1c4f2d9b37'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Per-topic stats were only available inside the test_attempt JSON blobs,
+    # so "students weak in topic X" queries had to load and parse every row.
+    # This table makes them a plain indexed SELECT.
+    op.create_table('topic_performance',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('attempt_id', sa.Integer(), nullable=False),
+    sa.Column('topic', sa.String(length=150), nullable=False),
+    sa.Column('correct', sa.Integer(), nullable=True),
+    sa.Column('total', sa.Integer(), nullable=True),
+    sa.Column('time_spent', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['attempt_id'], ['test_attempt.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('topic_performance', schema=None) as batch_op:
+        batch_op.create_index('ix_topic_performance_attempt_id', ['attempt_id'], unique=False)
+        batch_op.create_index('ix_topic_performance_topic', ['topic'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('topic_performance', schema=None) as batch_op:
+        batch_op.drop_index('ix_topic_performance_topic')
+        batch_op.drop_index('ix_topic_performance_attempt_id')
+    op.drop_table('topic_performance')
@@ -0,0 +1,43 @@
+"""Make status flag columns NOT NULL with false defaults
+
+Revision ID: d7b8e03f1a65
+Revises: a9274d16e508
+Create Date: 2025-11-05 11:36:20.774402
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7b8e03f1a65'
+down_revision = 'a9274d16e508'
+branch_labels = None
+depends_on = None
+
+_FLAG_COLUMNS = {
+    'test_attempt': ['auto_submitted_due_to_violation', 'reviewed', 'followup_attempted'],
+    'student_answer': ['is_correct', 'marked_for_review'],
+    'followup_assignment': ['is_attempted', 'is_correct'],
+    'student_review': ['followup_assigned'],
+}
+
+
+def upgrade():
+    # Nullable booleans force three-valued logic on every WHERE flag = ...
+    # predicate; backfill NULLs to false, then lock the columns down.
+    for table, columns in _FLAG_COLUMNS.items():
+        for column in columns:
+            op.execute(f"UPDATE {table} SET {column} = 0 WHERE {column} IS NULL")
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            for column in columns:
+                batch_op.alter_column(column, existing_type=sa.Boolean(),
+                                      nullable=False, server_default=sa.false())
+
+
+def downgrade():
+    for table, columns in _FLAG_COLUMNS.items():
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            for column in columns:
+                batch_op.alter_column(column, existing_type=sa.Boolean(),
+                                      nullable=True, server_default=None)
@@ -0,0 +1,53 @@
+"""Add review_wrong_question association table
+
+Revision ID: e4f06c2b87d1
+Revises: d7b8e03f1a65
+Create Date: 2025-11-05 16:54:12.083266
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4f06c2b87d1'
+down_revision = 'd7b8e03f1a65'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # "Which students got question X wrong across reviews" previously meant
+    # JSON-parsing every student_review row; the junction table makes it an
+    # indexed join in either direction.
+    op.create_table('review_wrong_question',
+    sa.Column('review_id', sa.Integer(), nullable=False),
+    sa.Column('question_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['question_id'], ['question.id'], ),
+    sa.ForeignKeyConstraint(['review_id'], ['student_review.id'], ),
+    sa.PrimaryKeyConstraint('review_id', 'question_id')
+    )
+    with op.batch_alter_table('review_wrong_question', schema=None) as batch_op:
+        batch_op.create_index('ix_review_wrong_question_question_id', ['question_id'], unique=False)
+
+    # Backfill from the legacy JSON arrays where the dialect can expand them.
+    dialect = op.get_context().dialect.name
+    if dialect == 'sqlite':
+        op.execute(
+            "INSERT INTO review_wrong_question (review_id, question_id) "
+            "SELECT sr.id, CAST(je.value AS INTEGER) "
+            "FROM student_review sr, json_each(sr.wrong_questions) je "
+            "WHERE sr.wrong_questions IS NOT NULL"
+        )
+    elif dialect == 'postgresql':
+        op.execute(
+            "INSERT INTO review_wrong_question (review_id, question_id) "
+            "SELECT id, jsonb_array_elements_text(wrong_questions::jsonb)::int "
+            "FROM student_review WHERE wrong_questions IS NOT NULL"
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('review_wrong_question', schema=None) as batch_op:
+        batch_op.drop_index('ix_review_wrong_question_question_id')
+    op.drop_table('review_wrong_question')
@@ -0,0 +1,29 @@
+"""Add percent column to test_attempt
+
+Revision ID: e8d41b7c6a29
+Revises: 9b3a52c8e1f0
+Create Date: 2025-11-07 12:26:18.573046
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8d41b7c6a29'
+down_revision = '9b3a52c8e1f0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Marks-weighted percent is persisted at submission so analytics pages
+    # read it instead of recomputing per attempt. Nullable: old attempts
+    # keep NULL and readers fall back to computing it.
+    with op.batch_alter_table('test_attempt', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('percent', sa.Float(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('test_attempt', schema=None) as batch_op:
+        batch_op.drop_column('percent')
@@ -0,0 +1,26 @@
+"""Add unique functional index on lower(email)
+
+Revision ID: f51e7a20c694
+Revises: c3d90b514e82
+Create Date: 2025-11-04 09:18:33.481209
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f51e7a20c694'
+down_revision = 'c3d90b514e82'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # CITEXT is Postgres-only; a functional index on lower(email) gives the
+    # same case-insensitive uniqueness/lookup on SQLite and MySQL 8+.
+    op.create_index('ix_user_email_lower', 'user', [sa.text('lower(email)')], unique=True)
+
+
+def downgrade():
+    op.drop_index('ix_user_email_lower', table_name='user')
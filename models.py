@@ -1,6 +1,7 @@
 from extensions import db
 from flask_login import UserMixin
 from datetime import datetime
+from functools import cached_property
 
 # ==========================
 # ✅ USER MODEL
@@ -14,13 +15,13 @@ class User(db.Model, UserMixin):
     password_hash = db.Column(db.String(200), nullable=False)
     role = db.Column(db.String(20), nullable=False)  # 'student' or 'teacher'
 
-    # Relationships
-    classes_taught = db.relationship("Class", backref="teacher", lazy=True)
-    test_attempts = db.relationship("TestAttempt", backref="student", lazy=True)
-    assignment_submissions = db.relationship("AssignmentSubmission", backref="student", lazy=True)
-    enrolled_classes = db.relationship("StudentClass", back_populates="student", lazy=True)
-    followup_assignments = db.relationship("FollowupAssignment", backref="student", lazy=True)
-    analytics = db.relationship("StudentAnalytics", backref="student", lazy=True)
+    # Relationships (explicit back_populates; large collections stay lazy)
+    classes_taught = db.relationship("Class", back_populates="teacher", lazy=True)
+    test_attempts = db.relationship("TestAttempt", back_populates="student", lazy=True)
+    assignment_submissions = db.relationship("AssignmentSubmission", back_populates="student", lazy=True)
+    enrolled_classes = db.relationship("StudentClass", back_populates="student", lazy="selectin")
+    followup_assignments = db.relationship("FollowupAssignment", back_populates="student", lazy=True)
+    analytics = db.relationship("StudentAnalytics", back_populates="student", lazy=True)
     reviews = db.relationship("StudentReview", back_populates="student", lazy=True)
 
 
@@ -29,6 +30,10 @@ class User(db.Model, UserMixin):
         return f"<User {self.name} ({self.role})>"
 
 
+# Case-insensitive email lookups hit this functional index instead of scanning
+db.Index("ix_user_email_lower", db.func.lower(User.email), unique=True)
+
+
 # ==========================
 # ✅ CLASS MODEL
 # ==========================
@@ -41,12 +46,15 @@ class Class(db.Model):
     teacher_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
 
     # Relationships
-    students = db.relationship("StudentClass", back_populates="class_obj", lazy=True, cascade="all, delete-orphan")
-    chapters = db.relationship("Chapter", backref="class_obj", lazy=True, cascade="all, delete-orphan")
-    assignments = db.relationship("Assignment", backref="class_obj", lazy=True, cascade="all, delete-orphan")
+    teacher = db.relationship("User", back_populates="classes_taught", lazy=True)
+    students = db.relationship("StudentClass", back_populates="class_obj", lazy="selectin", cascade="all, delete-orphan")
+    chapters = db.relationship("Chapter", back_populates="class_obj", lazy=True, cascade="all, delete-orphan")
+    assignments = db.relationship("Assignment", back_populates="class_obj", lazy=True, cascade="all, delete-orphan")
 
-    @property
+    @cached_property
     def enrolled_users(self):
+        # Cached per instance: templates reference this more than once and the
+        # StudentClass rows are loaded via selectin, so build the list only once.
         return [sc.student for sc in self.students]
 
     def __repr__(self):
@@ -59,13 +67,17 @@ class Class(db.Model):
 class StudentClass(db.Model):
     __tablename__ = "student_class"
 
+    __table_args__ = (
+        db.UniqueConstraint("student_id", "class_id", name="uq_student_class"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
     class_id = db.Column(db.Integer, db.ForeignKey("class.id"), nullable=False)
-    joined_at = db.Column(db.DateTime, default=datetime.utcnow)
+    joined_at = db.Column(db.DateTime, server_default=db.func.now())
 
     # Relationships
-    student = db.relationship("User", back_populates="enrolled_classes", lazy=True)
+    student = db.relationship("User", back_populates="enrolled_classes", lazy="selectin")
     class_obj = db.relationship("Class", back_populates="students", lazy=True)
 
     def __repr__(self):
@@ -82,7 +94,8 @@ class Chapter(db.Model):
     name = db.Column(db.String(100), nullable=False)
     class_id = db.Column(db.Integer, db.ForeignKey("class.id"), nullable=False)
 
-    tests = db.relationship("Test", backref="chapter", lazy=True, cascade="all, delete-orphan")
+    class_obj = db.relationship("Class", back_populates="chapters", lazy=True)
+    tests = db.relationship("Test", back_populates="chapter", lazy=True, cascade="all, delete-orphan")
 
     def __repr__(self):
         return f"<Chapter {self.name} in Class {self.class_id}>"
@@ -96,16 +109,18 @@ class Test(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
-    chapter_id = db.Column(db.Integer, db.ForeignKey("chapter.id"), nullable=False)
+    chapter_id = db.Column(db.Integer, db.ForeignKey("chapter.id"), nullable=False, index=True)
 
-    start_time = db.Column(db.DateTime, default=datetime.utcnow)
+    start_time = db.Column(db.DateTime, server_default=db.func.now())
     end_time = db.Column(db.DateTime, nullable=True)
     duration_minutes = db.Column(db.Integer, nullable=False)
     max_score = db.Column(db.Integer, default=100)
 
     # Relationships
-    questions = db.relationship("Question", backref="test", lazy=True, cascade="all, delete-orphan")
-    attempts = db.relationship("TestAttempt", backref="test", lazy=True, cascade="all, delete-orphan")
+    chapter = db.relationship("Chapter", back_populates="tests", lazy=True)
+    questions = db.relationship("Question", back_populates="test", lazy="selectin", cascade="all, delete-orphan")
+    attempts = db.relationship("TestAttempt", back_populates="test", lazy=True, cascade="all, delete-orphan")
+    reviews = db.relationship("StudentReview", back_populates="test", lazy=True)
 
     def __repr__(self):
         return f"<Test {self.name} | Chapter {self.chapter_id}>"
@@ -117,12 +132,17 @@ class Test(db.Model):
 class TestAttempt(db.Model):
     __tablename__ = "test_attempt"
 
+    __table_args__ = (
+        db.Index("ix_test_attempt_student_test", "student_id", "test_id", unique=True),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
-    test_id = db.Column(db.Integer, db.ForeignKey("test.id"), nullable=False)
-    student_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    test_id = db.Column(db.Integer, db.ForeignKey("test.id"), nullable=False, index=True)
+    student_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False, index=True)
 
     score = db.Column(db.Float, default=0.0)
-    attempted_at = db.Column(db.DateTime, default=datetime.utcnow)
+    percent = db.Column(db.Float, nullable=True)  # marks-weighted, set at submission
+    attempted_at = db.Column(db.DateTime, server_default=db.func.now())
     end_time = db.Column(db.DateTime, nullable=True)
 
     total_questions = db.Column(db.Integer, default=0)
@@ -131,18 +151,24 @@ class TestAttempt(db.Model):
     time_taken = db.Column(db.Integer, default=0)
 
     topic_performance = db.Column(db.JSON, nullable=True)
-    auto_submitted_due_to_violation = db.Column(db.Boolean, default=False)
-    reviewed = db.Column(db.Boolean, default=False)
+    auto_submitted_due_to_violation = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+    reviewed = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
     review_completed_at = db.Column(db.DateTime, nullable=True)
     followup_score = db.Column(db.Float, default=None)
-    followup_attempted = db.Column(db.Boolean, default=False)
+    followup_attempted = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
     topic_time = db.Column(db.JSON, nullable=True)  # time spent per topic
     weak_topics_after_followup = db.Column(db.JSON, nullable=True)
-   
 
 
-    answers = db.relationship("StudentAnswer", backref="attempt", lazy=True, cascade="all, delete-orphan")
-    followup_assignments = db.relationship("FollowupAssignment", backref="attempt", lazy=True, cascade="all, delete-orphan")
+
+    test = db.relationship("Test", back_populates="attempts", lazy=True)
+    student = db.relationship("User", back_populates="test_attempts", lazy=True)
+    answers = db.relationship("StudentAnswer", back_populates="attempt", lazy="selectin", cascade="all, delete-orphan")
+    topic_performances = db.relationship("TopicPerformance", back_populates="attempt", lazy="selectin", cascade="all, delete-orphan")
+    followup_assignments = db.relationship("FollowupAssignment", back_populates="attempt", lazy=True, cascade="all, delete-orphan")
+    proctoring_logs = db.relationship("ProctoringLog", back_populates="attempt", lazy=True)
+    stress_logs = db.relationship("StressLog", back_populates="attempt", lazy=True)
+    proctoring_summary = db.relationship("ProctoringSummary", back_populates="attempt", uselist=False, lazy="joined")
 
     def __repr__(self):
         return f"<Attempt student={self.student_id} test={self.test_id} score={self.score}>"
@@ -154,22 +180,48 @@ class TestAttempt(db.Model):
 class StudentAnswer(db.Model):
     __tablename__ = "student_answer"
 
+    __table_args__ = (
+        db.Index("ix_student_answer_attempt_question", "attempt_id", "question_id", unique=True),
+        db.Index("ix_student_answer_attempt_correct", "attempt_id", "is_correct"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
-    attempt_id = db.Column(db.Integer, db.ForeignKey("test_attempt.id"), nullable=False)
-    question_id = db.Column(db.Integer, db.ForeignKey("question.id"), nullable=False)
+    attempt_id = db.Column(db.Integer, db.ForeignKey("test_attempt.id"), nullable=False, index=True)
+    question_id = db.Column(db.Integer, db.ForeignKey("question.id"), nullable=False, index=True)
 
     selected_option = db.Column(db.String(1), nullable=True)
-    is_correct = db.Column(db.Boolean, default=False)
+    is_correct = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
     time_spent = db.Column(db.Integer, default=0)
-    marked_for_review = db.Column(db.Boolean, default=False)
-    
-    question = db.relationship("Question", backref="student_answers", lazy=True)
+    marked_for_review = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+
+    attempt = db.relationship("TestAttempt", back_populates="answers", lazy="joined")
+    question = db.relationship("Question", back_populates="student_answers", lazy="selectin")
 
 
     def __repr__(self):
         return f"<StudentAnswer question={self.question_id} correct={self.is_correct}>"
 
 
+# ==========================
+# ✅ PER-TOPIC PERFORMANCE (normalized from TestAttempt.topic_performance JSON)
+# ==========================
+class TopicPerformance(db.Model):
+    __tablename__ = "topic_performance"
+
+    id = db.Column(db.Integer, primary_key=True)
+    attempt_id = db.Column(db.Integer, db.ForeignKey("test_attempt.id"), nullable=False, index=True)
+    topic = db.Column(db.String(150), nullable=False, index=True)
+
+    correct = db.Column(db.Integer, default=0)
+    total = db.Column(db.Integer, default=0)
+    time_spent = db.Column(db.Integer, default=0)
+
+    attempt = db.relationship("TestAttempt", back_populates="topic_performances", lazy=True)
+
+    def __repr__(self):
+        return f"<TopicPerformance attempt={self.attempt_id} topic={self.topic} {self.correct}/{self.total}>"
+
+
 # ==========================
 # ✅ QUESTION MODEL
 # ==========================
@@ -190,7 +242,9 @@ class Question(db.Model):
     topic = db.Column(db.String(100), nullable=True)
     difficulty = db.Column(db.String(20), nullable=True)
 
-    ai_topic = db.relationship("Topic", backref="question", uselist=False)
+    test = db.relationship("Test", back_populates="questions", lazy=True)
+    student_answers = db.relationship("StudentAnswer", back_populates="question", lazy=True)
+    ai_topic = db.relationship("Topic", back_populates="question", uselist=False, lazy="joined")
 
     def __repr__(self):
         return f"<Question {self.text[:25]}...>"
@@ -208,7 +262,8 @@ class Assignment(db.Model):
     due_date = db.Column(db.DateTime, nullable=True)
     class_id = db.Column(db.Integer, db.ForeignKey("class.id"), nullable=False)
 
-    submissions = db.relationship("AssignmentSubmission", backref="assignment", lazy=True, cascade="all, delete-orphan")
+    class_obj = db.relationship("Class", back_populates="assignments", lazy=True)
+    submissions = db.relationship("AssignmentSubmission", back_populates="assignment", lazy=True, cascade="all, delete-orphan")
 
     def __repr__(self):
         return f"<Assignment {self.title}>"
@@ -221,11 +276,14 @@ class AssignmentSubmission(db.Model):
     assignment_id = db.Column(db.Integer, db.ForeignKey("assignment.id"), nullable=False)
     student_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
 
-    submitted_at = db.Column(db.DateTime, default=datetime.utcnow)
+    submitted_at = db.Column(db.DateTime, server_default=db.func.now())
     score = db.Column(db.Float, default=0.0)
     feedback = db.Column(db.Text, nullable=True)
     improvement_score = db.Column(db.Float, default=0.0)
 
+    assignment = db.relationship("Assignment", back_populates="submissions", lazy=True)
+    student = db.relationship("User", back_populates="assignment_submissions", lazy=True)
+
     def __repr__(self):
         return f"<AssignmentSubmission student={self.student_id} assignment={self.assignment_id}>"
 
@@ -245,11 +303,13 @@ class StudentAnalytics(db.Model):
     strong_topics = db.Column(db.JSON, nullable=True)
     predicted_weak_topics = db.Column(db.JSON, nullable=True)
     history = db.Column(db.JSON, nullable=True)  # keeps track of every attempt & improvement
-    last_updated = db.Column(db.DateTime, default=datetime.utcnow)
+    last_updated = db.Column(db.DateTime, server_default=db.func.now())
     topic_time = db.Column(db.JSON, nullable=True)          # time per topic across attempts
     followup_progress = db.Column(db.JSON, nullable=True)   # {"Algebra":{"attempted":2,"correct":1,"improvement":20}}
     learning_gaps = db.Column(db.JSON, nullable=True)       # {"Algebra":"Needs extra practice on quadratic equations"}
 
+    student = db.relationship("User", back_populates="analytics", lazy=True)
+
 
     def __repr__(self):
         return f"<Analytics student={self.student_id} class={self.class_id}>"
@@ -261,10 +321,14 @@ class StudentAnalytics(db.Model):
 # ==========================
 class ProctoringLog(db.Model):
     __tablename__ = "proctoring_log"
+    __table_args__ = (
+        # Proctoring reviews read one attempt's logs in time order
+        db.Index("ix_proc_attempt_ts", "attempt_id", "timestamp"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     attempt_id = db.Column(db.Integer, db.ForeignKey("test_attempt.id"), nullable=False)
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    timestamp = db.Column(db.DateTime, server_default=db.func.now())
 
     face_detected = db.Column(db.Boolean, default=True)
     multiple_faces = db.Column(db.Boolean, default=False)
@@ -276,7 +340,7 @@ class ProctoringLog(db.Model):
     system_message = db.Column(db.String(255), nullable=True)
     auto_submitted = db.Column(db.Boolean, default=False)
 
-    attempt = db.relationship("TestAttempt", backref="proctoring_logs")
+    attempt = db.relationship("TestAttempt", back_populates="proctoring_logs", lazy=True)
 
     def __repr__(self):
         return f"<ProctoringLog attempt={self.attempt_id} warnings={self.warning_level}>"
@@ -287,12 +351,12 @@ class StressLog(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     attempt_id = db.Column(db.Integer, db.ForeignKey("test_attempt.id"), nullable=False)
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    timestamp = db.Column(db.DateTime, server_default=db.func.now())
 
     detected_emotion = db.Column(db.String(50))
     confidence = db.Column(db.Float, default=0.0)
 
-    attempt = db.relationship("TestAttempt", backref="stress_logs")
+    attempt = db.relationship("TestAttempt", back_populates="stress_logs", lazy=True)
 
     def __repr__(self):
         return f"<StressLog attempt={self.attempt_id} emotion={self.detected_emotion}>"
@@ -309,7 +373,7 @@ class ProctoringSummary(db.Model):
     total_window_shifts = db.Column(db.Integer, default=0)
     last_action = db.Column(db.String(255), nullable=True)
 
-    attempt = db.relationship("TestAttempt", backref="proctoring_summary", uselist=False)
+    attempt = db.relationship("TestAttempt", back_populates="proctoring_summary", lazy="joined")
 
     def __repr__(self):
         return f"<ProctoringSummary attempt={self.attempt_id} warnings={self.total_warnings}>"
@@ -330,8 +394,9 @@ class Topic(db.Model):
     question_id = db.Column(db.Integer, db.ForeignKey("question.id"), nullable=True)
     notes = db.Column(db.Text, nullable=True)
 
-    followup_assignments = db.relationship("FollowupAssignment", backref="topic", lazy=True, cascade="all, delete-orphan")
-    recommended_videos = db.relationship("RecommendedVideo", backref="topic", lazy=True, cascade="all, delete-orphan")
+    question = db.relationship("Question", back_populates="ai_topic", lazy=True)
+    followup_assignments = db.relationship("FollowupAssignment", back_populates="topic", lazy="selectin", cascade="all, delete-orphan")
+    recommended_videos = db.relationship("RecommendedVideo", back_populates="topic", lazy="selectin", cascade="all, delete-orphan")
 
     def __repr__(self):
         return f"<Topic {self.name}>"
@@ -340,22 +405,29 @@ class Topic(db.Model):
 class FollowupAssignment(db.Model):
     __tablename__ = "followup_assignment"
 
+    __table_args__ = (
+        db.Index("ix_followup_assignment_student_topic", "student_id", "topic_id"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey("user.id", name="fk_followup_student_id"), nullable=False)
     topic_id = db.Column(db.Integer, db.ForeignKey("topic.id", name="fk_followup_topic_id"), nullable=False)
-    attempt_id = db.Column(db.Integer, db.ForeignKey("test_attempt.id", name="fk_followup_attempt_id"), nullable=False)
+    attempt_id = db.Column(db.Integer, db.ForeignKey("test_attempt.id", name="fk_followup_attempt_id"), nullable=False, index=True)
 
     question_text = db.Column(db.Text, nullable=False)
     options = db.Column(db.JSON, nullable=False)
     correct_answer = db.Column(db.String(1), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, server_default=db.func.now())
 
-    is_attempted = db.Column(db.Boolean, default=False)
+    is_attempted = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
     student_answer = db.Column(db.String(1), nullable=True)
-    is_correct = db.Column(db.Boolean, default=False)
+    is_correct = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
     ai_hint = db.Column(db.Text, nullable=True)
     difficulty = db.Column(db.String(20), nullable=True)  # easy, medium, hard
 
+    student = db.relationship("User", back_populates="followup_assignments", lazy=True)
+    topic = db.relationship("Topic", back_populates="followup_assignments", lazy=True)
+    attempt = db.relationship("TestAttempt", back_populates="followup_assignments", lazy=True)
 
     def __repr__(self):
         return f"<FollowupAssignment student={self.student_id} topic={self.topic_id} attempt={self.attempt_id}>"
@@ -374,7 +446,9 @@ class RecommendedVideo(db.Model):
     video_summary = db.Column(db.Text, nullable=True)
     video_thumbnail = db.Column(db.String(500), nullable=True)
 
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, server_default=db.func.now())
+
+    topic = db.relationship("Topic", back_populates="recommended_videos", lazy=True)
 
     def __repr__(self):
         return f"<RecommendedVideo topic={self.topic_id} title={self.video_title[:25]}>"
@@ -393,23 +467,46 @@ class TopicTrick(db.Model):
 
 class StudentReview(db.Model):
     __tablename__ = "student_review"
+    __table_args__ = (
+        # Report pages read one student's reviews for one test
+        db.Index("ix_student_review_student_test", "student_id", "test_id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
     test_id = db.Column(db.Integer, db.ForeignKey("test.id"), nullable=False)
     topic_name = db.Column(db.String(150), nullable=False)
-    reviewed_on = db.Column(db.DateTime, default=datetime.utcnow)
+    reviewed_on = db.Column(db.DateTime, server_default=db.func.now())
 
-    test = db.relationship("Test", backref="reviews", lazy=True)
+    test = db.relationship("Test", back_populates="reviews", lazy=True)
     wrong_questions = db.Column(db.JSON, nullable=True)
-    followup_assigned = db.Column(db.Boolean, default=False)
+    followup_assigned = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
     followup_results = db.Column(db.JSON, nullable=True)
     remaining_weak_topics = db.Column(db.JSON, nullable=True)
 
     student = db.relationship("User", back_populates="reviews", lazy=True)
+    wrong_question_links = db.relationship(
+        "ReviewWrongQuestion", back_populates="review", lazy="selectin",
+        cascade="all, delete-orphan"
+    )
 
 
 
 
     def __repr__(self):
-        return f"<StudentReview student={self.student_id} topic={self.topic_name}>"
\ No newline at end of file
+        return f"<StudentReview student={self.student_id} topic={self.topic_name}>"
+
+
+# ==========================
+# ✅ REVIEW ↔ WRONG QUESTION ASSOCIATION
+# ==========================
+class ReviewWrongQuestion(db.Model):
+    __tablename__ = "review_wrong_question"
+
+    review_id = db.Column(db.Integer, db.ForeignKey("student_review.id"), primary_key=True)
+    question_id = db.Column(db.Integer, db.ForeignKey("question.id"), primary_key=True, index=True)
+
+    review = db.relationship("StudentReview", back_populates="wrong_question_links", lazy=True)
+
+    def __repr__(self):
+        return f"<ReviewWrongQuestion review={self.review_id} question={self.question_id}>"
@@ -1,11 +1,35 @@
+import hmac
+
 from flask import Blueprint, render_template, request, redirect, url_for, flash
 from flask_login import login_user, logout_user, login_required
 from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy.orm import raiseload
 
 from models import db, User
 
 auth_bp = Blueprint("auth", __name__)
 
+
+def _verify_password(user, password):
+    """Check a login password, upgrading legacy plaintext rows in place.
+
+    Accounts created before hashing landed still store the raw password;
+    those are compared in constant time and transparently rehashed on the
+    first successful login. check_password_hash is already constant-time
+    for hashed rows.
+    """
+    stored = user.password_hash or ""
+    # Match on the known werkzeug method prefixes rather than ":" — a legacy
+    # plaintext password containing a colon must still take the upgrade path
+    if stored.startswith(("scrypt:", "pbkdf2:")):
+        return check_password_hash(stored, password)
+    # compare_digest rejects non-ASCII str; compare as UTF-8 bytes
+    if hmac.compare_digest(stored.encode("utf-8"), (password or "").encode("utf-8")):
+        user.password_hash = generate_password_hash(password, method="scrypt")
+        db.session.commit()
+        return True
+    return False
+
 # ==========================
 # ✅ SIGNUP
 # ==========================
@@ -13,8 +37,8 @@ auth_bp = Blueprint("auth", __name__)
 def signup():
     if request.method == "POST":
         name = request.form.get("username")
-        email = request.form.get("email")
-        password = request.form.get("password")  # Store as plain text
+        email = (request.form.get("email") or "").strip().lower()
+        password = request.form.get("password")
         role = request.form.get("role")
 
         # Validate required fields
@@ -22,20 +46,21 @@ def signup():
             flash("All fields are required.", "danger")
             return redirect(url_for("auth.signup"))
 
-        # Check for existing user
+        # Check for existing user (no relationships needed; raiseload guards
+        # against accidental lazy loads creeping in here)
         existing_user = User.query.filter(
-            (User.email == email) | (User.name == name)
-        ).first()
+            (db.func.lower(User.email) == email) | (User.name == name)
+        ).options(raiseload("*")).first()
 
         if existing_user:
             flash("A user with this email or username already exists.", "danger")
             return redirect(url_for("auth.signup"))
 
-        # Create user with plain password in password_hash field
+        # Hash once at signup so login verification stays a single O(1) check
         new_user = User(
             name=name,
             email=email,
-            password_hash=password,  # <-- Using password_hash column for plain password
+            password_hash=generate_password_hash(password, method="scrypt"),
             role=role
         )
         db.session.add(new_user)
@@ -56,12 +81,14 @@ def login():
         name_or_email = request.form.get("username")
         password = request.form.get("password")
 
-        # Allow login via username OR email
+        # Allow login via username OR email (email matched case-insensitively
+        # against the lower(email) index)
         user = User.query.filter(
-            (User.name == name_or_email) | (User.email == name_or_email)
+            (User.name == name_or_email)
+            | (db.func.lower(User.email) == (name_or_email or "").strip().lower())
         ).first()
 
-        if not user or user.password_hash != password:  # Plain text comparison
+        if not user or not _verify_password(user, password):
             flash("Invalid username/email or password", "error")
             return redirect(url_for("auth.login"))
 
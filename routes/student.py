@@ -11,23 +11,30 @@ from flask_login import current_user, login_required
 # DATABASE & MODELS
 # ==============================
 from models import (
-    db, Class, StudentClass, Test, Question, TestAttempt, StudentAnswer,
+    db, Class, Chapter, StudentClass, Test, Question, TestAttempt, StudentAnswer,
     AssignmentSubmission, ProctoringLog, RecommendedVideo, Topic,
-    FollowupAssignment, User,  TopicNote, TopicTrick, StudentReview, StudentAnalytics
+    FollowupAssignment, User,  TopicNote, TopicTrick, StudentReview, StudentAnalytics,
+    TopicPerformance
 )
-from sqlalchemy.orm import joinedload
+from sqlalchemy import and_, case, func
+from sqlalchemy.orm import joinedload, selectinload, raiseload
+from caching import get_test
+from analytics import refresh_student_analytics
 
 # ==============================
 # UTILITY IMPORTS
 # ==============================
 from datetime import datetime, timedelta
+import hashlib
 import os
 import json
 import requests
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 import threading
 import time
 import traceback
+from collections import Counter, deque
 from flask import current_app
 from concurrent.futures import ThreadPoolExecutor
 
@@ -35,11 +42,12 @@ from concurrent.futures import ThreadPoolExecutor
 # ==============================
 # IMAGE / VIDEO PROCESSING
 # ==============================
+# cv2, mediapipe and ultralytics are heavyweight imports that only the
+# proctoring endpoint needs; they load lazily inside the model getters and
+# analyze_frame so every other route in this blueprint skips their startup
+# cost entirely.
 import base64
-import cv2
 import numpy as np
-import mediapipe as mp
-from ultralytics import YOLO
 
 # ==============================
 # AI / GEMINI
@@ -51,6 +59,12 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY")
 client = genai.Client(api_key=GEMINI_API_KEY)
 
+# Shared HTTP session for YouTube API calls: reuses TLS connections to
+# googleapis.com across requests and thread-pool workers instead of paying a
+# fresh handshake per call.
+_http = requests.Session()
+_http.mount("https://", HTTPAdapter(pool_connections=10, pool_maxsize=20))
+
 # single blueprint declaration
 student_bp = Blueprint("student", __name__, url_prefix="/student")
 
@@ -61,6 +75,18 @@ load_dotenv()
 # ==============================
 # DASHBOARD
 # ==============================
+def _test_status(test, attempted, now):
+    """Status label for one test; only falls back to duration arithmetic when
+    the test has no explicit end time."""
+    end = test.end_time
+    if end is None:
+        end = test.start_time + timedelta(minutes=(test.duration_minutes or 0))
+    if test.start_time <= now <= end:
+        return "Active"
+    return "Attempted" if attempted else "Unattempted"
+
+
+
 @student_bp.route("/dashboard")
 @login_required
 def dashboard():
@@ -68,48 +94,58 @@ def dashboard():
         db.session.query(Class)
         .join(StudentClass, StudentClass.class_id == Class.id)
         .filter(StudentClass.student_id == current_user.id)
+        # template shows cls.teacher; anything else lazy-loading here is a
+        # regression, so make it raise instead of silently fanning out
+        .options(selectinload(Class.teacher), raiseload("*"))
         .all()
     )
 
-    class_tests_status = {}
+    class_tests_status = {cls.id: [] for cls in enrolled_classes}
     now = datetime.now()
 
-    for cls in enrolled_classes:
-        class_tests_status[cls.id] = []
-
-        for chapter in cls.chapters:
-            for test in chapter.tests:
-                attempt = TestAttempt.query.filter_by(
-                    student_id=current_user.id, test_id=test.id
-                ).first()
-
-                # Determine test status
-                if test.start_time <= now <= (
-                    test.end_time or (test.start_time + timedelta(minutes=(test.duration_minutes or 0)))
-                ):
-                    status = "Active"
-                elif attempt:
-                    status = "Attempted"
-                else:
-                    status = "Unattempted"
-
-                # Scores
-                if attempt:
-                    correct = StudentAnswer.query.filter_by(attempt_id=attempt.id, is_correct=True).count()
-                    wrong = StudentAnswer.query.filter_by(attempt_id=attempt.id, is_correct=False).count()
-                    total_questions = StudentAnswer.query.filter_by(attempt_id=attempt.id).count()
-                    score = attempt.score
-                else:
-                    correct = wrong = total_questions = score = 0
+    # One aggregate per attempt replaces the old per-test count() trio.
+    # Scoped to this student's attempts — unfiltered, the subquery would
+    # materialize a GROUP BY over the whole student_answer table per view.
+    stats_sq = (
+        db.session.query(
+            StudentAnswer.attempt_id.label("attempt_id"),
+            func.sum(case((StudentAnswer.is_correct == True, 1), else_=0)).label("correct"),
+            func.sum(case((StudentAnswer.is_correct == False, 1), else_=0)).label("wrong"),
+            func.count().label("total"),
+        )
+        .join(TestAttempt, TestAttempt.id == StudentAnswer.attempt_id)
+        .filter(TestAttempt.student_id == current_user.id)
+        .group_by(StudentAnswer.attempt_id)
+        .subquery()
+    )
+
+    # Single round-trip for every test (and its attempt stats) the student can see
+    rows = (
+        db.session.query(
+            Class.id, Test, TestAttempt,
+            stats_sq.c.correct, stats_sq.c.wrong, stats_sq.c.total,
+        )
+        .join(StudentClass, StudentClass.class_id == Class.id)
+        .join(Chapter, Chapter.class_id == Class.id)
+        .join(Test, Test.chapter_id == Chapter.id)
+        .outerjoin(TestAttempt, and_(
+            TestAttempt.test_id == Test.id,
+            TestAttempt.student_id == current_user.id,
+        ))
+        .outerjoin(stats_sq, stats_sq.c.attempt_id == TestAttempt.id)
+        .filter(StudentClass.student_id == current_user.id)
+        .all()
+    )
 
-                class_tests_status[cls.id].append({
-                    "test": test,
-                    "status": status,
-                    "correct": correct,
-                    "wrong": wrong,
-                    "total": total_questions,
-                    "score": score,
-                })
+    for class_id, test, attempt, correct, wrong, total_questions, in rows:
+        class_tests_status[class_id].append({
+            "test": test,
+            "status": _test_status(test, attempt is not None, now),
+            "correct": correct or 0,
+            "wrong": wrong or 0,
+            "total": total_questions or 0,
+            "score": attempt.score if attempt else 0,
+        })
 
     return render_template(
         "student/dashboard.html",
@@ -118,6 +154,30 @@ def dashboard():
     )
 
 
+# ==============================
+# ENROLLMENT CHECK (session-cached)
+# ==============================
+def _is_enrolled(class_id):
+    """Gate student routes without a SQL round-trip on every request.
+
+    Enrollment almost never changes mid-session, so confirmed class ids are
+    cached in the session; SQL runs only on a cache miss.
+    """
+    cache_key = f"enrolled_class_ids_{current_user.id}"
+    cached = session.get(cache_key, [])
+    if class_id in cached:
+        return True
+
+    # Existence check only — no need to hydrate a StudentClass instance
+    enrolled = db.session.query(StudentClass.id).filter_by(
+        student_id=current_user.id, class_id=class_id
+    ).first()
+    if enrolled:
+        session[cache_key] = cached + [class_id]
+        return True
+    return False
+
+
 # ==============================
 # JOIN CLASS
 # ==============================
@@ -131,7 +191,7 @@ def join_class():
         flash("Invalid join code", "danger")
         return redirect(url_for("student.dashboard"))
 
-    already_joined = StudentClass.query.filter_by(
+    already_joined = db.session.query(StudentClass.id).filter_by(
         student_id=current_user.id, class_id=class_obj.id
     ).first()
 
@@ -141,6 +201,9 @@ def join_class():
         new_enrollment = StudentClass(student_id=current_user.id, class_id=class_obj.id)
         db.session.add(new_enrollment)
         db.session.commit()
+        # Keep the session enrollment cache in sync with the new row
+        cache_key = f"enrolled_class_ids_{current_user.id}"
+        session[cache_key] = session.get(cache_key, []) + [class_obj.id]
         flash(f"Successfully joined {class_obj.name}", "success")
 
     return redirect(url_for("student.dashboard"))
@@ -152,28 +215,43 @@ def join_class():
 @student_bp.route("/class/<int:class_id>")
 @login_required
 def class_detail(class_id):
-    class_obj = Class.query.get_or_404(class_id)
+    # Load the whole chapters -> tests tree and the assignments in three
+    # IN-batched queries instead of one lazy SELECT per chapter/collection
+    class_obj = (
+        Class.query
+        .options(
+            selectinload(Class.chapters).selectinload(Chapter.tests),
+            selectinload(Class.assignments),
+            raiseload("*"),
+        )
+        .filter_by(id=class_id)
+        .first_or_404()
+    )
 
     # Check enrollment
-    is_enrolled = StudentClass.query.filter_by(student_id=current_user.id, class_id=class_id).first()
-    if not is_enrolled:
+    if not _is_enrolled(class_id):
         flash("You are not enrolled in this class", "danger")
         return redirect(url_for("student.dashboard"))
 
-    # Prepare test attempts dictionary
-    attempts = {}
-    for chapter in class_obj.chapters:
-        for test in chapter.tests:
-            attempt = TestAttempt.query.filter_by(student_id=current_user.id, test_id=test.id).first()
-            if attempt:
-                attempts[test.id] = attempt
-
-    # Prepare assignment submissions dictionary
-    submissions = {}
-    for assignment in class_obj.assignments:
-        submission = AssignmentSubmission.query.filter_by(student_id=current_user.id, assignment_id=assignment.id).first()
-        if submission:
-            submissions[assignment.id] = submission
+    # Bulk-fetch the student's attempts and submissions for this class in
+    # two IN-queries, keyed for O(1) template lookups
+    test_ids = [t.id for chapter in class_obj.chapters for t in chapter.tests]
+    attempts = {
+        a.test_id: a
+        for a in TestAttempt.query.filter(
+            TestAttempt.student_id == current_user.id,
+            TestAttempt.test_id.in_(test_ids),
+        ).all()
+    } if test_ids else {}
+
+    assignment_ids = [a.id for a in class_obj.assignments]
+    submissions = {
+        s.assignment_id: s
+        for s in AssignmentSubmission.query.filter(
+            AssignmentSubmission.student_id == current_user.id,
+            AssignmentSubmission.assignment_id.in_(assignment_ids),
+        ).all()
+    } if assignment_ids else {}
 
     return render_template(
         "student/class_detail.html",
@@ -186,17 +264,59 @@ def class_detail(class_id):
     )
 
 
+# ==============================
+# SCORING HELPER
+# ==============================
+def _attempt_answer_stats(attempt_id):
+    """Correct/wrong/answered counts for an attempt in one aggregate query."""
+    correct, wrong, total = (
+        db.session.query(
+            func.sum(case((StudentAnswer.is_correct == True, 1), else_=0)),
+            func.sum(case((StudentAnswer.is_correct == False, 1), else_=0)),
+            func.count(),
+        )
+        .filter(StudentAnswer.attempt_id == attempt_id)
+        .one()
+    )
+    return correct or 0, wrong or 0, total or 0
+
+
+def _attempt_percent(attempt_id):
+    """Marks-weighted percent for one attempt, computed in the database."""
+    marks = func.coalesce(Question.marks, 1)
+    total, obtained = (
+        db.session.query(
+            func.sum(marks),
+            func.sum(case((StudentAnswer.is_correct, marks), else_=0)),
+        )
+        .join(Question, Question.id == StudentAnswer.question_id)
+        .filter(StudentAnswer.attempt_id == attempt_id)
+        .one()
+    )
+    return round(((obtained or 0) / total) * 100, 2) if total else 0
+
+
 # ==============================
 # START TEST
 # ==============================
 @student_bp.route("/start_test/<int:test_id>/<int:question_index>", methods=["GET", "POST"])
 @login_required
 def start_test(test_id, question_index=0):
-    test = Test.query.get_or_404(test_id)
+    # Every request here walks test.chapter (for class_id) and
+    # test.questions, so fetch them with the test instead of lazily
+    test = (
+        Test.query
+        .options(
+            joinedload(Test.chapter),
+            selectinload(Test.questions),
+            raiseload("*"),
+        )
+        .filter_by(id=test_id)
+        .first_or_404()
+    )
     class_id = test.chapter.class_id
-    enrolled = StudentClass.query.filter_by(student_id=current_user.id, class_id=class_id).first()
 
-    if not enrolled:
+    if not _is_enrolled(class_id):
         flash("You are not enrolled in this class", "danger")
         return redirect(url_for("student.dashboard"))
 
@@ -208,12 +328,13 @@ def start_test(test_id, question_index=0):
         flash("⏰ Test is already over!", "danger")
         return redirect(url_for("student.dashboard"))
 
-    # Retrieve or create attempt
+    # Retrieve or create attempt; flush assigns the PK so one commit below
+    # covers both the new row and its dynamic end_time
     attempt = TestAttempt.query.filter_by(student_id=current_user.id, test_id=test.id).first()
     if not attempt:
         attempt = TestAttempt(student_id=current_user.id, test_id=test.id, attempted_at=now)
         db.session.add(attempt)
-        db.session.commit()
+        db.session.flush()
 
     # Dynamic end_time
     if not attempt.end_time:
@@ -226,10 +347,10 @@ def start_test(test_id, question_index=0):
 
     remaining_seconds = int((attempt.end_time - now).total_seconds())
     if remaining_seconds <= 0:
-        attempt.correct_answers = StudentAnswer.query.filter_by(attempt_id=attempt.id, is_correct=True).count()
-        attempt.wrong_answers = StudentAnswer.query.filter_by(attempt_id=attempt.id, is_correct=False).count()
+        attempt.correct_answers, attempt.wrong_answers, _ = _attempt_answer_stats(attempt.id)
         attempt.total_questions = len(test.questions)
         attempt.score = attempt.correct_answers
+        attempt.percent = _attempt_percent(attempt.id)
         db.session.commit()
         flash("⏰ Time over! Test submitted automatically.", "danger")
         return redirect(url_for("student.dashboard"))
@@ -244,7 +365,9 @@ def start_test(test_id, question_index=0):
         return redirect(url_for("student.start_test", test_id=test_id, question_index=0))
 
     current_question = questions[question_index]
-    student_answer = StudentAnswer.query.filter_by(attempt_id=attempt.id, question_id=current_question.id).first()
+    # attempt.answers is selectin-loaded; index once instead of querying per question
+    answers_by_qid = {a.question_id: a for a in attempt.answers}
+    student_answer = answers_by_qid.get(current_question.id)
     options = {"A": current_question.option_a, "B": current_question.option_b,
                "C": current_question.option_c, "D": current_question.option_d}
 
@@ -267,26 +390,32 @@ def start_test(test_id, question_index=0):
                 student_answer.selected_option = selected_option
                 student_answer.is_correct = selected_option == current_question.correct_option
             student_answer.marked_for_review = mark_review
-        db.session.commit()
 
-        # Navigation or submit
-        if "next" in request.form and question_index + 1 < total_questions:
-            return redirect(url_for("student.start_test", test_id=test.id, question_index=question_index + 1))
-        elif "prev" in request.form and question_index > 0:
-            return redirect(url_for("student.start_test", test_id=test.id, question_index=question_index - 1))
-        elif "submit" in request.form:
-            attempt.correct_answers = StudentAnswer.query.filter_by(attempt_id=attempt.id, is_correct=True).count()
-            attempt.wrong_answers = StudentAnswer.query.filter_by(attempt_id=attempt.id, is_correct=False).count()
+        # One commit per POST: on submit, flush so the aggregate sees the
+        # answer just saved, then commit the answer and the final scores
+        # together
+        if "submit" in request.form:
+            db.session.flush()
+            attempt.correct_answers, attempt.wrong_answers, _ = _attempt_answer_stats(attempt.id)
             attempt.total_questions = total_questions
             attempt.score = attempt.correct_answers
+            attempt.percent = _attempt_percent(attempt.id)
             db.session.commit()
+            refresh_student_analytics(current_user.id, class_id)
             flash("🎉 Test submitted successfully!", "success")
             return redirect(url_for("student.review_test", attempt_id=attempt.id))
 
+        db.session.commit()
+        if "next" in request.form and question_index + 1 < total_questions:
+            return redirect(url_for("student.start_test", test_id=test.id, question_index=question_index + 1))
+        elif "prev" in request.form and question_index > 0:
+            return redirect(url_for("student.start_test", test_id=test.id, question_index=question_index - 1))
+
     # -------------------- Sidebar State --------------------
+    answers_by_qid = {a.question_id: a for a in attempt.answers}
     q_states = {}
     for idx, q in enumerate(questions):
-        ans = StudentAnswer.query.filter_by(attempt_id=attempt.id, question_id=q.id).first()
+        ans = answers_by_qid.get(q.id)
         if ans and ans.marked_for_review:
             q_states[idx] = "review"
         elif ans and ans.selected_option:
@@ -315,7 +444,9 @@ def ajax_save_answer(test_id, question_index):
     action = data.get("action")
     selected_option = data.get("selected_option")
 
-    test = Test.query.get_or_404(test_id)
+    test = get_test(test_id)
+    if not test:
+        return jsonify({"error": "Test not found"}), 404
     attempt = TestAttempt.query.filter_by(student_id=current_user.id, test_id=test.id).first()
     if not attempt:
         return jsonify({"error": "Attempt not found"}), 404
@@ -325,7 +456,8 @@ def ajax_save_answer(test_id, question_index):
         return jsonify({"error": "Invalid question index"}), 400
 
     current_question = questions[question_index]
-    student_answer = StudentAnswer.query.filter_by(attempt_id=attempt.id, question_id=current_question.id).first()
+    answers_by_qid = {a.question_id: a for a in attempt.answers}
+    student_answer = answers_by_qid.get(current_question.id)
     if not student_answer:
         student_answer = StudentAnswer(attempt_id=attempt.id, question_id=current_question.id)
         db.session.add(student_answer)
@@ -341,54 +473,307 @@ def ajax_save_answer(test_id, question_index):
             student_answer.selected_option = selected_option
             student_answer.is_correct = (selected_option == current_question.correct_option)
 
-    db.session.commit()
-
     if action == "submit":
-        attempt.correct_answers = StudentAnswer.query.filter_by(attempt_id=attempt.id, is_correct=True).count()
-        attempt.wrong_answers = StudentAnswer.query.filter_by(attempt_id=attempt.id, is_correct=False).count()
+        # Flush (not commit) so the tally aggregate sees the answer saved
+        # above, then commit the answer and attempt totals in one fsync.
+        db.session.flush()
+        attempt.correct_answers, attempt.wrong_answers, _ = _attempt_answer_stats(attempt.id)
         attempt.total_questions = len(questions)
         attempt.score = attempt.correct_answers
+        attempt.percent = _attempt_percent(attempt.id)
         db.session.commit()
+        refresh_student_analytics(current_user.id, test.chapter.class_id)
         return jsonify({"submit": True})
 
-    # Update q_states & counts
+    db.session.commit()
+
+    new_index = question_index
+    if action == "next" and question_index + 1 < len(questions):
+        new_index += 1
+    elif action == "prev" and question_index > 0:
+        new_index -= 1
+
+    # Incremental mode: only the current question's state can have changed,
+    # so return a one-entry delta and let the client patch its local map
+    # instead of recomputing all N states per click
+    if data.get("incremental"):
+        if student_answer.marked_for_review:
+            new_state = "review"
+        elif student_answer.selected_option:
+            new_state = "answered"
+        else:
+            new_state = "visited"
+        return jsonify({"delta": {question_index: new_state}, "new_index": new_index})
+
+    # Update q_states & counts. The sidebar only needs three columns, so
+    # re-read them as plain tuples instead of rehydrating the whole
+    # StudentAnswer collection the commit just expired.
+    answer_rows = {
+        qid: (selected, marked)
+        for qid, selected, marked in db.session.query(
+            StudentAnswer.question_id,
+            StudentAnswer.selected_option,
+            StudentAnswer.marked_for_review,
+        ).filter_by(attempt_id=attempt.id)
+    }
     q_states = {}
     for idx, q in enumerate(questions):
-        ans = StudentAnswer.query.filter_by(attempt_id=attempt.id, question_id=q.id).first()
-        if ans and ans.marked_for_review:
+        row = answer_rows.get(q.id)
+        if row and row[1]:
             q_states[idx] = "review"
-        elif ans and ans.selected_option:
+        elif row and row[0]:
             q_states[idx] = "answered"
-        elif ans or idx == question_index:
+        elif row or idx == question_index:
             q_states[idx] = "visited"
         else:
             q_states[idx] = "not_visited"
 
-    counts = {state: list(q_states.values()).count(state) for state in ["answered", "review", "visited", "not_visited"]}
-
-    new_index = question_index
-    if action == "next" and question_index + 1 < len(questions):
-        new_index += 1
-    elif action == "prev" and question_index > 0:
-        new_index -= 1
+    state_counts = Counter(q_states.values())
+    counts = {state: state_counts.get(state, 0) for state in ["answered", "review", "visited", "not_visited"]}
 
     return jsonify({"q_states": q_states, "counts": counts, "new_index": new_index})
 
+# ==============================
+# REVIEW CONTENT GENERATION
+# ==============================
+# Task-shaped on purpose: this is the unit of work a queue worker would run.
+# A Celery offload needs a broker this deployment doesn't have, so the route
+# calls it inline for now; when a broker lands, wrap it in a task and have
+# the route poll instead.
+def _generate_topic_names(questions):
+    """Name the topics for many questions with a single Gemini call.
+
+    Question texts seen before (by any student, keyed on a hash of the
+    truncated text) resolve from the per-worker cache without touching the
+    API. Returns {question_id: topic_name}; cache hits are still returned
+    if the call or parse fails for the rest.
+    """
+    names = {}
+    digests_by_qid = {}
+    missing = []
+    for q in questions:
+        digest = hashlib.sha256((q.text or "")[:100].encode()).hexdigest()
+        digests_by_qid[q.id] = digest
+        cached = _cached_resource(("topic_name", digest))
+        if cached:
+            names[q.id] = cached
+        else:
+            missing.append(q)
+
+    if not missing:
+        return names
+
+    try:
+        payload = json.dumps([{"id": q.id, "text": q.text} for q in missing])
+        prompt = (
+            "For each machine learning question below, identify its main topic "
+            "(max 5 words). Respond with only a JSON object mapping each id to "
+            "its topic name.\n" + payload
+        )
+        response = client.models.generate_content(
+            model="gemini-2.5-flash",
+            contents=prompt
+        )
+        text = response.text.strip().replace("```json", "").replace("```", "").strip()
+        reply = json.loads(text)
+        for qid, topic_name in reply.items():
+            topic_name = (topic_name or "").strip()
+            if not topic_name or topic_name.lower() in ["unknown topic", "general concept"]:
+                topic_name = "Core Machine Learning Concept"
+            qid = int(qid)
+            names[qid] = topic_name
+            if qid in digests_by_qid:
+                _store_resource(("topic_name", digests_by_qid[qid]), topic_name)
+    except Exception as e:
+        print("Topic generation error:", e)
+    return names
+
+
+# Topic names repeat across students in a class, so identical Gemini/YouTube
+# lookups recur constantly. Successful results are cached per worker with a
+# TTL; failures are not cached so they retry on the next miss.
+_topic_resource_cache = {}
+_topic_resource_lock = threading.Lock()
+_TOPIC_RESOURCE_TTL = 86400
+
+
+def _cached_resource(key):
+    with _topic_resource_lock:
+        hit = _topic_resource_cache.get(key)
+        if hit and time.time() - hit[0] < _TOPIC_RESOURCE_TTL:
+            return hit[1]
+    return None
+
+
+def _store_resource(key, value):
+    with _topic_resource_lock:
+        _topic_resource_cache[key] = (time.time(), value)
+
+
+def _fetch_topic_resources(topic_name, need_video, need_notes):
+    """Fetch video metadata and/or notes for one topic. No DB access here -
+    this runs on worker threads and the session is not thread-safe."""
+    result = {"video": None, "notes": None}
+
+    if need_video:
+        result["video"] = _cached_resource(("video", topic_name))
+    if need_video and result["video"] is None:
+        try:
+            search_url = (
+                "https://www.googleapis.com/youtube/v3/search"
+                f"?part=snippet&q={topic_name}+machine+learning+education&type=video&maxResults=1&key={YOUTUBE_API_KEY}"
+            )
+            resp = _http.get(search_url, timeout=3).json()
+            item = resp.get("items", [])[0] if resp.get("items") else None
+
+            if item:
+                vid_id = item["id"].get("videoId")
+                video_title = item["snippet"]["title"]
+                video_thumbnail = item["snippet"]["thumbnails"]["high"]["url"]
+
+                # Generate summary (Gemini)
+                summary_prompt = f"Summarize the educational value of '{video_title}' in 2 lines."
+                summary_resp = client.models.generate_content(
+                    model="gemini-2.5-flash",
+                    contents=summary_prompt
+                )
+
+                result["video"] = {
+                    "video_title": video_title,
+                    "video_url": f"https://www.youtube.com/embed/{vid_id}",
+                    "video_thumbnail": video_thumbnail,
+                    "video_summary": summary_resp.text.strip(),
+                }
+                _store_resource(("video", topic_name), result["video"])
+        except Exception as e:
+            print("Video fetch error:", e)
+
+    if need_notes:
+        result["notes"] = _cached_resource(("notes", topic_name))
+    if need_notes and result["notes"] is None:
+        try:
+            notes_prompt = (
+                f"Write concise 5-bullet educational notes for {topic_name}. "
+                "Focus on intuition, core concept, and key takeaways."
+            )
+            notes_resp = client.models.generate_content(
+                model="gemini-2.5-flash",
+                contents=notes_prompt
+            )
+            result["notes"] = notes_resp.text.strip()
+            _store_resource(("notes", topic_name), result["notes"])
+        except Exception as e:
+            print("Notes generation error:", e)
+
+    return result
+
+
+def generate_review_content(answers):
+    """Resolve topic, video and notes for each wrong/unattempted answer.
+
+    External calls (Gemini, YouTube) are independent per question/topic and
+    purely I/O-bound, so they fan out on a thread pool; all DB writes happen
+    on the request thread after the workers join.
+    """
+    question_weak_topics = {}
+    topic_data = {}
+
+    wrong = [
+        (answer, question) for answer, question in answers
+        if not answer.selected_option or answer.selected_option != question.correct_option
+    ]
+    if not wrong:
+        return question_weak_topics, topic_data
+
+    # ---- Identify or Generate Topics ----
+    question_ids = [question.id for _, question in wrong]
+    topics_by_qid = {
+        t.question_id: t
+        for t in Topic.query.filter(Topic.question_id.in_(question_ids)).all()
+    }
+
+    missing = [question for _, question in wrong if question.id not in topics_by_qid]
+    if missing:
+        # One multi-question prompt instead of one HTTPS round-trip per question
+        names_by_qid = _generate_topic_names(missing)
+        for question in missing:
+            topic = Topic(
+                name=names_by_qid.get(question.id, "Core Machine Learning Concept"),
+                question_id=question.id,
+                confidence_score=0.8,
+            )
+            db.session.add(topic)
+            topics_by_qid[question.id] = topic
+        db.session.flush()  # use flush to get topic ids without committing yet
+
+    for _, question in wrong:
+        question_weak_topics[question.id] = topics_by_qid[question.id].name
+
+    # ---- Prepare Topic Data (one entry per distinct topic name) ----
+    topics_by_name = {}
+    for topic in topics_by_qid.values():
+        topics_by_name.setdefault(topic.name, topic)
+
+    topic_ids = [topic.id for topic in topics_by_name.values()]
+    videos_by_topic_id = {
+        v.topic_id: v
+        for v in RecommendedVideo.query.filter(RecommendedVideo.topic_id.in_(topic_ids)).all()
+    }
+
+    def fetch(topic):
+        return topic.name, _fetch_topic_resources(
+            topic.name,
+            need_video=topic.id not in videos_by_topic_id,
+            need_notes=not topic.notes,
+        )
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        fetched_by_name = dict(executor.map(fetch, topics_by_name.values()))
+
+    for topic_name, topic in topics_by_name.items():
+        fetched = fetched_by_name.get(topic_name, {"video": None, "notes": None})
+
+        vid = videos_by_topic_id.get(topic.id)
+        if vid is None and fetched["video"]:
+            vid = RecommendedVideo(topic_id=topic.id, **fetched["video"])
+            db.session.add(vid)
+
+        if not topic.notes and fetched["notes"]:
+            topic.notes = fetched["notes"]
+        notes = topic.notes or f"Study notes unavailable for {topic_name}."
+
+        topic_data[topic_name] = {"video": vid, "notes": notes}
+
+    # Commit once at the end for efficiency
+    db.session.commit()
+
+    # Ensure each weak topic has a topic_data entry
+    for answer, question in answers:
+        tname = question_weak_topics.get(question.id)
+        if tname and tname not in topic_data:
+            topic_data[tname] = {"video": None, "notes": "Notes unavailable."}
+
+    return question_weak_topics, topic_data
+
+
 # ==============================
 # REVIEW TEST (Final Robust Version - Synced with models.py)
 # ==============================
 @student_bp.route("/review_test/<int:attempt_id>")
 @login_required
 def review_test(attempt_id):
-    from sqlalchemy.orm import joinedload
-    import requests
-    from datetime import datetime
-
-    # 1️⃣ Fetch attempt and related test
+    # 1️⃣ Fetch attempt and related test (answers/questions eager, everything
+    # else raises instead of silently lazy-loading)
     attempt = (
         TestAttempt.query
         .filter_by(id=attempt_id, student_id=current_user.id)
-        .options(joinedload(TestAttempt.test))
+        .options(
+            joinedload(TestAttempt.test),
+            selectinload(TestAttempt.answers)
+            .selectinload(StudentAnswer.question)
+            .joinedload(Question.ai_topic),
+            raiseload("*"),
+        )
         .first_or_404()
     )
     test = attempt.test
@@ -406,115 +791,8 @@ def review_test(attempt_id):
         flash("No review data available for this test yet.", "info")
         return redirect(url_for("student.dashboard"))
 
-    question_weak_topics = {}
-    topic_data = {}
-
-    # 3️⃣ Process wrong or unattempted answers
-    for answer, question in answers:
-        if not answer.selected_option or answer.selected_option != question.correct_option:
-
-            # ---- Identify or Generate Topic ----
-            topic = Topic.query.filter_by(question_id=question.id).first()
-            if not topic:
-                try:
-                    prompt = (
-                        f'Identify the main topic of this machine learning question: "{question.text}". '
-                        "Respond with a concise topic name (max 5 words)."
-                    )
-                    response = client.models.generate_content(
-                        model="gemini-2.5-flash",
-                        contents=prompt
-                    )
-                    topic_name = response.text.strip()
-
-                    if not topic_name or topic_name.lower() in ["unknown topic", "general concept"]:
-                        topic_name = "Core Machine Learning Concept"
-
-                    topic = Topic(name=topic_name, question_id=question.id, confidence_score=0.8)
-                    db.session.add(topic)
-                    db.session.flush()  # use flush to get topic.id without committing yet
-                except Exception as e:
-                    print("Topic generation error:", e)
-                    topic_name = "Core Machine Learning Concept"
-            else:
-                topic_name = topic.name
-
-            question_weak_topics[question.id] = topic_name
-
-            # ---- Prepare Topic Data ----
-            if topic_name not in topic_data:
-                topic_entry = {"video": None, "notes": None}
-
-                # 3a️⃣ Fetch or generate YouTube Video
-                vid = RecommendedVideo.query.filter_by(topic_id=topic.id).first()
-                if not vid:
-                    try:
-                        search_url = (
-                            "https://www.googleapis.com/youtube/v3/search"
-                            f"?part=snippet&q={topic_name}+machine+learning+education&type=video&maxResults=1&key={YOUTUBE_API_KEY}"
-                        )
-                        resp = requests.get(search_url).json()
-                        item = resp.get("items", [])[0] if resp.get("items") else None
-
-                        if item:
-                            vid_id = item["id"].get("videoId")
-                            video_title = item["snippet"]["title"]
-                            video_thumbnail = item["snippet"]["thumbnails"]["high"]["url"]
-                            video_url = f"https://www.youtube.com/embed/{vid_id}"
-
-                            # Generate summary (Gemini)
-                            summary_prompt = f"Summarize the educational value of '{video_title}' in 2 lines."
-                            summary_resp = client.models.generate_content(
-                                model="gemini-2.5-flash",
-                                contents=summary_prompt
-                            )
-                            video_summary = summary_resp.text.strip()
-
-                            vid = RecommendedVideo(
-                                topic_id=topic.id,
-                                video_title=video_title,
-                                video_url=video_url,
-                                video_thumbnail=video_thumbnail,
-                                video_summary=video_summary
-                            )
-                            db.session.add(vid)
-                            db.session.flush()
-                    except Exception as e:
-                        print("Video fetch error:", e)
-                        vid = None
-
-                topic_entry["video"] = vid
-
-                # 3b️⃣ Fetch or Generate Notes
-                try:
-                    if topic.notes:
-                        notes = topic.notes
-                    else:
-                        notes_prompt = (
-                            f"Write concise 5-bullet educational notes for {topic_name}. "
-                            "Focus on intuition, core concept, and key takeaways."
-                        )
-                        notes_resp = client.models.generate_content(
-                            model="gemini-2.5-flash",
-                            contents=notes_prompt
-                        )
-                        notes = notes_resp.text.strip()
-                        topic.notes = notes
-                except Exception as e:
-                    print("Notes generation error:", e)
-                    notes = f"Study notes unavailable for {topic_name}."
-
-                topic_entry["notes"] = notes
-                topic_data[topic_name] = topic_entry
-
-    # Commit once at the end for efficiency
-    db.session.commit()
-
-    # Ensure each weak topic has a topic_data entry
-    for answer, question in answers:
-        tname = question_weak_topics.get(question.id)
-        if tname and tname not in topic_data:
-            topic_data[tname] = {"video": None, "notes": "Notes unavailable."}
+    # 3️⃣ Generate topics/videos/notes for wrong or unattempted answers
+    question_weak_topics, topic_data = generate_review_content(answers)
 
     return render_template(
         "student/review_test.html",
@@ -541,16 +819,20 @@ def mark_review_done(attempt_id):
     attempt.review_completed_at = datetime.utcnow()
     db.session.add(attempt)
 
-    # Save reviewed topics
+    # Save reviewed topics in one multi-row INSERT; nothing reads these
+    # objects back, so skip per-instance unit-of-work bookkeeping
     reviewed_topics = request.form.getlist("topics[]")
-    for topic_name in reviewed_topics:
-        review_entry = StudentReview(
-            student_id=current_user.id,
-            test_id=attempt.test_id,
-            topic_name=topic_name,
-            reviewed_on=datetime.utcnow()
-        )
-        db.session.add(review_entry)
+    if reviewed_topics:
+        now = datetime.utcnow()
+        db.session.bulk_insert_mappings(StudentReview, [
+            {
+                "student_id": current_user.id,
+                "test_id": attempt.test_id,
+                "topic_name": topic_name,
+                "reviewed_on": now,
+            }
+            for topic_name in reviewed_topics
+        ])
 
     db.session.commit()
     flash("✅ Review completed successfully! Weak topics recorded for tracking.", "success")
@@ -561,20 +843,57 @@ def mark_review_done(attempt_id):
 # PROCTORING: YOLO + Mediapipe
 # ==============================
 yolo_model = None
-face_mesh = None
+
+# The YOLO weights are shared by every request thread in a worker, and
+# concurrent forward passes just thrash the CPU, so YOLO inference is
+# serialized per worker. FaceMesh is different: its C++ graph is stateful
+# (static_image_mode=False) and not thread-safe, so each request thread gets
+# its own instance via threading.local instead of queueing on a lock.
+_model_init_lock = threading.Lock()
+_inference_lock = threading.Lock()
+_tls = threading.local()
+
+# Export once with YOLO("yolov8n.pt").export(format="engine", half=True) on a
+# GPU box (or format="onnx" for CPU deploys) and drop the file next to the
+# weights — inference picks up the fastest backend available at boot.
+YOLO_WEIGHTS = ("yolov8n.engine", "yolov8n.onnx", "yolov8n.pt")
 
 def get_yolo_model():
     global yolo_model
     if yolo_model is None:
-        yolo_model = YOLO("yolov8n.pt")
+        with _model_init_lock:
+            if yolo_model is None:
+                from ultralytics import YOLO
+
+                # Torch defaults to one thread per core; with several Flask
+                # workers that oversubscribes the CPU and slows everyone down.
+                import torch
+                torch.set_num_threads(1)
+                for weights in YOLO_WEIGHTS:
+                    if os.path.exists(weights):
+                        yolo_model = YOLO(weights)
+                        break
+                else:
+                    yolo_model = YOLO("yolov8n.pt")
     return yolo_model
 
 def get_face_mesh():
-    global face_mesh
-    if face_mesh is None:
+    if not hasattr(_tls, "face_mesh"):
+        import mediapipe as mp
+
         mp_face_mesh = mp.solutions.face_mesh
-        face_mesh = mp_face_mesh.FaceMesh(static_image_mode=False, max_num_faces=1, min_detection_confidence=0.5)
-    return face_mesh
+        _tls.face_mesh = mp_face_mesh.FaceMesh(static_image_mode=False, max_num_faces=1, min_detection_confidence=0.5)
+    return _tls.face_mesh
+
+# Only two COCO classes are ever consumed downstream; filtering in the model
+# call skips NMS/post-processing for the other 78.
+PERSON_CLS = 0
+PHONE_CLS = 67
+
+# Webcam frames arrive at full capture resolution (often 1280x720), but
+# YOLOv8n and FaceMesh are both accurate at ~320px and inference cost scales
+# with pixel count — downscale once and run both models on the small frame.
+PROCTOR_FRAME_SIZE = (320, 240)
 
 scenario_msgs = {
     "No face detected": "🚨 Hey! We can’t see you on camera. Please sit in front of it.",
@@ -584,17 +903,81 @@ scenario_msgs = {
     "Window switched": "🖥️ You switched tabs! Stay on the test page to continue safely."
 }
 
+# Routine (non-suspicious) frame logs are buffered per worker and flushed in
+# one multi-row INSERT — a commit per frame is fsync-bound and dominates the
+# handler once a full class is being proctored. Suspicious events force an
+# immediate flush so real-time alerting still sees them.
+_log_buffer = deque()
+_log_buffer_lock = threading.Lock()
+_LOG_FLUSH_SIZE = 50
+_LOG_FLUSH_SECS = 10
+_last_log_flush = time.time()
+
+def flush_proctoring_logs(force=False):
+    global _last_log_flush
+    with _log_buffer_lock:
+        now = time.time()
+        if not _log_buffer:
+            return
+        if not force and len(_log_buffer) < _LOG_FLUSH_SIZE and now - _last_log_flush < _LOG_FLUSH_SECS:
+            return
+        rows = list(_log_buffer)
+        _log_buffer.clear()
+        _last_log_flush = now
+    db.session.execute(ProctoringLog.__table__.insert(), rows)
+    db.session.commit()
+
+
+# Proctoring warning counters live server-side instead of in the signed
+# cookie session: no cookie re-sign per frame POST, and the client can no
+# longer tamper with its own counter. Entries expire after _WARN_TTL of
+# inactivity. (The store is per-process; move it to a shared store if this
+# ever runs multi-worker.)
+_warn_counters = {}
+_warn_lock = threading.Lock()
+_WARN_TTL = 1800
+_WARN_LIMIT = 5
+_WARN_DEBOUNCE_SECS = 2
+
+def bump_warnings(user_id, attempt_id, suspicious, now_ts):
+    """Update the warning counter for one attempt; returns (count, auto_submit)."""
+    key = (user_id, attempt_id)
+    with _warn_lock:
+        stale = [k for k, v in _warn_counters.items() if now_ts - v[2] > _WARN_TTL]
+        for k in stale:
+            del _warn_counters[k]
+
+        count, last_warn, _ = _warn_counters.get(key, (0, 0.0, now_ts))
+        if suspicious and now_ts - last_warn > _WARN_DEBOUNCE_SECS:
+            count += 1
+            last_warn = now_ts
+        if count >= _WARN_LIMIT:
+            _warn_counters.pop(key, None)
+            return 0, True
+        _warn_counters[key] = (count, last_warn, now_ts)
+        return count, False
+
+
+# FaceMesh landmark indices for the eye corners/lids used in gaze checks.
+LEFT_EYE_IDX = np.array([33, 133, 159, 145])
+RIGHT_EYE_IDX = np.array([263, 362, 386, 374])
+
 def check_eye_gaze(landmarks):
-    left_eye = np.mean([[landmarks[i].x, landmarks[i].y] for i in [33, 133, 159, 145]], axis=0)
-    right_eye = np.mean([[landmarks[i].x, landmarks[i].y] for i in [263, 362, 386, 374]], axis=0)
-    eye_center_x = (left_eye[0] + right_eye[0]) / 2
-    eye_center_y = (left_eye[1] + right_eye[1]) / 2
-    return not (0.35 < eye_center_x < 0.65 and 0.35 < eye_center_y < 0.65)
+    # Bulk-extract all landmark coords once, then fancy-index — this runs per
+    # frame per student, so per-landmark attribute access adds up fast.
+    pts = np.fromiter(
+        (v for lm in landmarks for v in (lm.x, lm.y)),
+        dtype=np.float32, count=len(landmarks) * 2,
+    ).reshape(-1, 2)
+    center = 0.5 * (pts[LEFT_EYE_IDX].mean(axis=0) + pts[RIGHT_EYE_IDX].mean(axis=0))
+    return not ((0.35 < center).all() and (center < 0.65).all())
 
 
 @student_bp.route("/analyze_frame", methods=["POST"])
 @login_required
 def analyze_frame():
+    import cv2
+
     data = request.get_json()
     attempt_id = data.get("attempt_id")
     frame_data = data.get("frame")
@@ -607,95 +990,242 @@ def analyze_frame():
         frame_data = frame_data.strip()
         img_bytes = base64.b64decode(frame_data.split(",")[1])
         nparr = np.frombuffer(img_bytes, np.uint8)
-        frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        # Half-resolution decode skips the highest-frequency DCT coefficients —
+        # much cheaper than a full decode followed by a resize.
+        frame = cv2.imdecode(nparr, cv2.IMREAD_REDUCED_COLOR_2)
+        if frame is None:
+            frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        if frame.shape[1] > PROCTOR_FRAME_SIZE[0]:
+            small = cv2.resize(frame, PROCTOR_FRAME_SIZE, interpolation=cv2.INTER_AREA)
+        else:
+            small = frame
     except Exception as e:
         return jsonify({"error": f"Frame decode failed: {str(e)}"}), 500
 
     # YOLO detection
     try:
         yolo_model = get_yolo_model()
-        results = yolo_model(frame, verbose=False)[0]
-        detected_objects = [yolo_model.names[int(box.cls)].lower() for box in results.boxes]
-        confidences = [float(box.conf) for box in results.boxes]
+        with _inference_lock:
+            results = yolo_model(
+                small, imgsz=320, verbose=False,
+                classes=[PERSON_CLS, PHONE_CLS], conf=0.3,
+            )[0]
+        cls_ids = results.boxes.cls.cpu().numpy().astype(int)
     except Exception as e:
         return jsonify({"error": f"YOLO detection failed: {str(e)}"}), 500
 
-    face_detected = "person" in detected_objects
-    multiple_faces = detected_objects.count("person") > 1
-    mobile_detected = any(obj in ["cell phone", "mobile"] and conf > 0.3 for obj, conf in zip(detected_objects, confidences))
+    person_count = int((cls_ids == PERSON_CLS).sum())
+    face_detected = person_count > 0
+    multiple_faces = person_count > 1
+    mobile_detected = bool((cls_ids == PHONE_CLS).any())
 
-    # Eye gaze detection
+    # Eye gaze detection — only worth running when YOLO saw a person; the
+    # empty-frame case otherwise pays a full FaceMesh pass (plus the BGR→RGB
+    # copy) just to confirm there is no face.
     eye_gaze_away = False
+    if face_detected:
+        try:
+            face_mesh_model = get_face_mesh()
+            # Convert into a reused thread-local buffer; allocating a fresh
+            # HxWx3 array per frame is pure GC churn at proctoring frame rates.
+            rgb_frame = getattr(_tls, "rgb_buf", None)
+            if rgb_frame is None or rgb_frame.shape != small.shape:
+                rgb_frame = _tls.rgb_buf = np.empty_like(small)
+            cv2.cvtColor(small, cv2.COLOR_BGR2RGB, dst=rgb_frame)
+            results_face = face_mesh_model.process(rgb_frame)
+            if results_face.multi_face_landmarks:
+                landmarks = results_face.multi_face_landmarks[0].landmark
+                eye_gaze_away = check_eye_gaze(landmarks)
+            else:
+                face_detected = False
+        except Exception as e:
+            print(f"[Eye gaze error] {e}")
+            eye_gaze_away = False
+
+    # Determine suspicious activity (first matching flag wins, same priority
+    # order as before; adding a scenario is now a one-line change)
+    flags = (
+        (not face_detected, "No face detected"),
+        (multiple_faces, "Multiple people detected"),
+        (mobile_detected, "Mobile phone detected"),
+        (eye_gaze_away, "Eye gaze away"),
+    )
+    suspicious = next((label for flag, label in flags if flag), None)
+
+    # Log to DB (buffered; suspicious events flush straight away)
     try:
-        face_mesh_model = get_face_mesh()
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results_face = face_mesh_model.process(rgb_frame)
-        if results_face.multi_face_landmarks:
-            landmarks = results_face.multi_face_landmarks[0].landmark
-            eye_gaze_away = check_eye_gaze(landmarks)
-        else:
-            face_detected = False
-    except Exception as e:
-        print(f"[Eye gaze error] {e}")
-        eye_gaze_away = False
-
-    # Determine suspicious activity
-    suspicious = None
-    if not face_detected:
-        suspicious = "No face detected"
-    elif multiple_faces:
-        suspicious = "Multiple people detected"
-    elif mobile_detected:
-        suspicious = "Mobile phone detected"
-    elif eye_gaze_away:
-        suspicious = "Eye gaze away"
-
-    # Log to DB
-    try:
-        log = ProctoringLog(
-            attempt_id=attempt_id,
-            face_detected=face_detected,
-            multiple_faces=multiple_faces,
-            mobile_detected=mobile_detected,
-            eye_gaze_away=eye_gaze_away,
-            suspicious_activity=suspicious,
-            timestamp=datetime.utcnow()
-        )
-        db.session.add(log)
-        db.session.commit()
+        _log_buffer.append({
+            "attempt_id": attempt_id,
+            "face_detected": face_detected,
+            "multiple_faces": multiple_faces,
+            "mobile_detected": mobile_detected,
+            "eye_gaze_away": eye_gaze_away,
+            "suspicious_activity": suspicious,
+            "timestamp": datetime.utcnow(),
+        })
+        flush_proctoring_logs(force=bool(suspicious))
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": f"DB logging failed: {str(e)}"}), 500
 
-    # Manage warnings
-    warn_key = f"warnings_{current_user.id}_{attempt_id}"
-    last_warn_key = f"last_warn_{current_user.id}_{attempt_id}"
-    now_ts = time.time()
-    session[warn_key] = session.get(warn_key, 0)
-    last_warn_time = session.get(last_warn_key, 0)
-
-    if suspicious and (now_ts - last_warn_time > 2):  # Debounce
-        session[warn_key] += 1
-        session[last_warn_key] = now_ts
-
-    auto_submit = False
-    if session.get(warn_key, 0) >= 5:
-        auto_submit = True
-        session[warn_key] = 0
-        session[last_warn_key] = 0
+    # Manage warnings (server-side counter, debounced)
+    warnings, auto_submit = bump_warnings(
+        current_user.id, attempt_id, suspicious, time.time()
+    )
 
     msg = scenario_msgs.get(suspicious) if suspicious else None
 
     return jsonify({
         "suspicious": suspicious,
         "msg": msg,
-        "warnings": session.get(warn_key, 0),
+        "warnings": warnings,
         "auto_submit": auto_submit
     })
 
 # ==============================
 # ADVANCED FOLLOW-UP ASSIGNMENT SYSTEM
 # ==============================
+# A double-clicked follow-up link races two requests into generation, each
+# paying a burst of Gemini calls and inserting duplicate rows. Generation is
+# guarded by a per-(student, attempt) slot; the losing request just redirects
+# and picks up the winner's rows. (Per-process, like the other locks here.)
+_followups_generating = set()
+_followup_gen_lock = threading.Lock()
+
+
+def _generate_followup_mcq(topic_name):
+    """Generate and parse one MCQ for a topic via Gemini. No DB access here -
+    this runs on worker threads; returns None if generation or parsing fails."""
+    cached = _cached_resource(("mcq", topic_name))
+    if cached is not None:
+        return cached
+    try:
+        # Ask for strict JSON instead of a line format - json.loads replaces
+        # the old startswith/split heuristics and their parsing bugs
+        response = client.models.generate_content(
+            model="gemini-2.0-flash",
+            contents=f"""
+            Create one high-quality MCQ for topic "{topic_name}".
+            Respond with strict JSON:
+            {{"question": "...",
+              "options": {{"A": "...", "B": "...", "C": "...", "D": "..."}},
+              "correct": "X",
+              "difficulty": "easy/medium/hard",
+              "hint": "short learning hint"}}
+            """,
+            config={"response_mime_type": "application/json"},
+        )
+        text = response.text.strip().replace("```json", "").replace("```", "").strip()
+        data = json.loads(text)
+        qtext = (data.get("question") or "").strip()
+        opts = data.get("options") or {}
+        correct = (data.get("correct") or "").strip()
+        difficulty = (data.get("difficulty") or "medium").strip()
+        hint = (data.get("hint") or "").strip()
+
+        if qtext and opts and correct:
+            mcq = {
+                "question": qtext,
+                "options": opts,
+                "correct": correct,
+                "difficulty": difficulty,
+                "hint": hint,
+            }
+            _store_resource(("mcq", topic_name), mcq)
+            return mcq
+    except Exception:
+        print("Follow-up generation error:", traceback.format_exc())
+    return None
+
+
+def _generate_followups(attempt):
+    """Generate follow-up assignments for an attempt's weak topics.
+
+    Returns an error string if any stage failed, else None. Commits once.
+    """
+    from sqlalchemy.exc import IntegrityError
+
+    generation_error = None
+    weak_topics = {}
+    wrong_answers = [ans for ans in attempt.answers if not ans.is_correct]
+
+    # Resolve topic names locally where the question already has one; the
+    # leftovers get named in one batched Gemini call instead of a round
+    # trip per wrong answer
+    names_by_ans = {}
+    unnamed = []
+    for ans in wrong_answers:
+        topic_name = ans.question.topic or (
+            ans.question.ai_topic.name if ans.question.ai_topic else None
+        )
+        if topic_name:
+            names_by_ans[ans.id] = topic_name
+        else:
+            unnamed.append(ans)
+
+    if unnamed:
+        generated = _generate_topic_names([ans.question for ans in unnamed])
+        if not generated:
+            generation_error = "Topic name generation failed."
+        for ans in unnamed:
+            name = generated.get(ans.question.id)
+            if name:
+                names_by_ans[ans.id] = name
+
+    for ans in wrong_answers:
+        topic_name = names_by_ans.get(ans.id)
+        if topic_name:
+            weak_topics.setdefault(topic_name, []).append(ans.id)
+
+    # Generate one MCQ per weak topic. The Gemini calls are independent
+    # and latency-bound, so they fan out on a thread pool; topics are
+    # preloaded in one IN query and all ORM writes happen on the request
+    # thread after the workers join.
+    topics_by_name = {
+        t.name: t
+        for t in Topic.query.filter(Topic.name.in_(list(weak_topics))).all()
+    } if weak_topics else {}
+
+    mcqs_by_topic = {}
+    if weak_topics:
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            mcqs_by_topic = dict(
+                zip(weak_topics, executor.map(_generate_followup_mcq, weak_topics))
+            )
+
+    for topic_name in weak_topics:
+        mcq = mcqs_by_topic.get(topic_name)
+        if not mcq:
+            generation_error = generation_error or f"MCQ generation failed for {topic_name}."
+            continue
+
+        topic = topics_by_name.get(topic_name)
+        if not topic:
+            topic = Topic(name=topic_name)
+            db.session.add(topic)
+            db.session.flush()  # assign topic.id without a commit
+            topics_by_name[topic_name] = topic
+
+        db.session.add(FollowupAssignment(
+            student_id=attempt.student_id,
+            attempt_id=attempt.id,
+            topic_id=topic.id,
+            question_text=mcq["question"],
+            options=mcq["options"],
+            correct_answer=mcq["correct"],
+            ai_hint=mcq["hint"],
+            difficulty=mcq["difficulty"]
+        ))
+
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        generation_error = "Follow-up generation failed due to DB integrity."
+
+    return generation_error
+
+
 @student_bp.route("/followup_assignment/<int:attempt_id>", methods=["GET", "POST"])
 @login_required
 def followup_assignment(attempt_id):
@@ -720,98 +1250,34 @@ def followup_assignment(attempt_id):
     # 3️⃣ Generate follow-ups if none exist
     # --------------------------
     if not existing_followups:
-        weak_topics = {}
-        wrong_answers = [ans for ans in attempt.answers if not ans.is_correct]
+        lock_key = (current_user.id, attempt.id)
+        with _followup_gen_lock:
+            already_running = lock_key in _followups_generating
+            if not already_running:
+                _followups_generating.add(lock_key)
 
-        for ans in wrong_answers:
+        if not already_running:
             try:
-                topic_name = ans.question.topic or ans.question.ai_topic.name if ans.question.ai_topic else None
-
-                # Generate topic name if missing
-                if not topic_name:
-                    question_text = ans.question.text[:100]
-                    response = client.models.generate_content(
-                        model="gemini-2.0-flash",
-                        contents=f"""
-                        Generate a concise topic name (1–3 words max) for this question:
-                        "{question_text}"
-                        Return only the topic name.
-                        """
-                    )
-                    topic_name = response.text.strip().replace("Topic:", "").strip()
-
-                if topic_name:
-                    weak_topics.setdefault(topic_name, []).append(ans.id)
-            except Exception as e:
-                print("Weak topic generation error:", traceback.format_exc())
-                generation_error = str(e)
-                continue
-
-        # Generate one MCQ per weak topic
-        generated_followups = []
-        for topic_name, question_ids in weak_topics.items():
-            try:
-                topic = Topic.query.filter_by(name=topic_name).first()
-                if not topic:
-                    topic = Topic(name=topic_name)
-                    db.session.add(topic)
-                    db.session.commit()
-
-                # Generate MCQ via AI
-                response = client.models.generate_content(
-                    model="gemini-2.0-flash",
-                    contents=f"""
-                    Create one high-quality MCQ for topic "{topic_name}".
-                    Format exactly as:
-                    Question: ...
-                    A) ...
-                    B) ...
-                    C) ...
-                    D) ...
-                    Correct Option: X
-                    Difficulty: easy/medium/hard
-                    Hint: short learning hint
-                    """
-                )
-                text = response.text.strip()
-                lines = [l.strip() for l in text.split("\n") if l.strip()]
-                qtext, opts, correct, difficulty, hint = "", {}, "", "medium", ""
-
-                for line in lines:
-                    if line.startswith("Question:"):
-                        qtext = line.replace("Question:", "").strip()
-                    elif line[:2] in ["A)", "B)", "C)", "D)"]:
-                        opts[line[0]] = line[2:].strip()
-                    elif "Correct Option" in line:
-                        correct = line.split(":")[-1].strip()
-                    elif "Difficulty" in line:
-                        difficulty = line.split(":")[-1].strip()
-                    elif "Hint" in line:
-                        hint = line.split(":", 1)[-1].strip()
-
-                if qtext and opts and correct:
-                    fa = FollowupAssignment(
-                        student_id=current_user.id,
-                        attempt_id=attempt.id,
-                        topic_id=topic.id,
-                        question_text=qtext,
-                        options=opts,
-                        correct_answer=correct,
-                        ai_hint=hint,
-                        difficulty=difficulty
-                    )
-                    db.session.add(fa)
-                    generated_followups.append(fa)
-            except Exception as e:
-                print("Follow-up generation error:", traceback.format_exc())
-                generation_error = str(e)
-                continue
-
-        try:
-            db.session.commit()
-        except IntegrityError:
-            db.session.rollback()
-            generation_error = "Follow-up generation failed due to DB integrity."
+                # Re-check under the slot: a concurrent request may have
+                # finished generating while this one was fetching the attempt
+                if not FollowupAssignment.query.filter_by(
+                    student_id=current_user.id, attempt_id=attempt.id
+                ).first():
+                    generation_error = _generate_followups(attempt)
+            finally:
+                with _followup_gen_lock:
+                    _followups_generating.discard(lock_key)
+        else:
+            # Lost the slot: the winner is mid-generation. Redirecting
+            # straight back finds no rows yet and bounces again — a tight
+            # loop that trips the browser's ~20-redirect cap. Wait
+            # (bounded) for the slot to clear, then redirect once.
+            deadline = time.time() + 90
+            while time.time() < deadline:
+                time.sleep(1)
+                with _followup_gen_lock:
+                    if lock_key not in _followups_generating:
+                        break
 
         return redirect(url_for("student.followup_assignment", attempt_id=attempt.id))
 
@@ -824,26 +1290,39 @@ def followup_assignment(attempt_id):
         improved_topics = {}
         remaining_weak_topics = {}
 
+        # Previous wrong-answer counts for every topic of this attempt in one
+        # grouped query instead of a COUNT per follow-up
+        wrong_by_topic = dict(
+            db.session.query(Question.topic, func.count())
+            .join(StudentAnswer, StudentAnswer.question_id == Question.id)
+            .filter(
+                StudentAnswer.attempt_id == attempt.id,
+                StudentAnswer.is_correct == False,
+            )
+            .group_by(Question.topic)
+            .all()
+        )
+
+        # Grade in Python, then push all follow-up rows down in one
+        # executemany instead of N dirty-object flushes
+        followup_updates = []
         for fa in existing_followups:
             submitted = request.form.get(f"followup_{fa.id}")
-            fa.student_answer = submitted
-            fa.is_attempted = bool(submitted)
-            fa.is_correct = submitted == fa.correct_answer
+            is_correct = submitted == fa.correct_answer
+            followup_updates.append({
+                "id": fa.id,
+                "student_answer": submitted,
+                "is_attempted": bool(submitted),
+                "is_correct": is_correct,
+            })
 
             topic_name = fa.topic.name if fa.topic else "Unknown"
 
             # Track improvement
             improved_topics.setdefault(topic_name, {"previous_incorrect": 0, "improved": 0})
+            improved_topics[topic_name]["previous_incorrect"] = wrong_by_topic.get(topic_name, 0)
 
-            # Count previous wrong answers related to topic
-            related_wrong = TestAttempt.query.join(StudentAnswer).join(Question).filter(
-                TestAttempt.id == attempt.id,
-                Question.topic == topic_name,
-                StudentAnswer.is_correct == False
-            ).count()
-            improved_topics[topic_name]["previous_incorrect"] = related_wrong
-
-            if fa.is_correct:
+            if is_correct:
                 correct_count += 1
                 improved_topics[topic_name]["improved"] += 1
             else:
@@ -853,11 +1332,28 @@ def followup_assignment(attempt_id):
 
             total += 1
 
+        db.session.bulk_update_mappings(FollowupAssignment, followup_updates)
+
         # Update attempt
         attempt.followup_score = round((correct_count / total) * 100, 2) if total else 0
         attempt.followup_attempted = True
         attempt.topic_performance = improved_topics
         attempt.weak_topics_after_followup = remaining_weak_topics
+
+        # Mirror per-topic stats into the normalized table so analytics can
+        # query them with an indexed SELECT instead of parsing JSON blobs.
+        # bulk_insert_mappings skips per-object ORM bookkeeping and sends the
+        # rows in one executemany batch.
+        TopicPerformance.query.filter_by(attempt_id=attempt.id).delete()
+        db.session.bulk_insert_mappings(TopicPerformance, [
+            {
+                "attempt_id": attempt.id,
+                "topic": topic_name,
+                "correct": data["improved"],
+                "total": data["previous_incorrect"] + data["improved"],
+            }
+            for topic_name, data in improved_topics.items()
+        ])
         db.session.commit()
 
         # Update analytics
@@ -1,5 +1,8 @@
 # routes/teacher.py
 
+import threading
+import time
+
 from flask import Blueprint, render_template, request, redirect, url_for, flash
 from flask_login import login_required, current_user
 from extensions import db
@@ -8,6 +11,7 @@ from models import (
     FollowupAssignment
 )
 from datetime import datetime
+from sqlalchemy.orm import joinedload, load_only, raiseload, selectinload
 
 teacher_bp = Blueprint("teacher", __name__, url_prefix="/teacher")
 
@@ -56,22 +60,33 @@ def create_class():
 @teacher_bp.route("/class/<int:class_id>")
 @login_required
 def view_class(class_id):
-    class_obj = Class.query.get_or_404(class_id)
+    class_obj = (
+        Class.query
+        .options(selectinload(Class.chapters).selectinload(Chapter.tests))
+        .filter_by(id=class_id)
+        .first_or_404()
+    )
     if class_obj.teacher_id != current_user.id:
         flash("Unauthorized access!", "danger")
         return redirect(url_for("teacher.dashboard"))
 
     enrolled_students = [sc.student for sc in class_obj.students]
 
+    # One grouped aggregate covers every test in the class instead of a
+    # per-test attempt scan
+    all_tests = [t for chapter in class_obj.chapters for t in chapter.tests]
+    stats = bulk_test_analytics([t.id for t in all_tests])
+
     for chapter in class_obj.chapters:
-        chapter_analytics = get_chapter_analytics(chapter.id)
-        chapter.avg_score = chapter_analytics["avg"]
-        chapter.lowest_test_name = chapter_analytics["lowest_test"]
+        valid_avgs = [stats[t.id]["avg"] for t in chapter.tests if stats[t.id]["avg"] > 0]
+        chapter.avg_score = round(sum(valid_avgs) / len(valid_avgs), 2) if valid_avgs else 0
+        chapter.lowest_test_name = (
+            min(chapter.tests, key=lambda t: stats[t.id]["avg"]).name if valid_avgs else None
+        )
         for test in chapter.tests:
-            t_analytics = get_test_analytics(test.id)
-            test.avg_score = t_analytics["avg"]
-            test.highest_score = t_analytics["highest"]
-            test.lowest_score = t_analytics["lowest"]
+            test.avg_score = stats[test.id]["avg"]
+            test.highest_score = stats[test.id]["highest"]
+            test.lowest_score = stats[test.id]["lowest"]
 
     return render_template(
         "teacher/view_class.html",
@@ -147,14 +162,25 @@ def create_test(chapter_id):
 
     return render_template("teacher/create_test.html", chapter_obj=chapter_obj)
 
+def _load_test_with_class(test_id):
+    """Fetch a test with its chapter and class in one query — every
+    test-scoped route walks test -> chapter -> class for the auth check."""
+    return (
+        Test.query
+        .options(joinedload(Test.chapter).joinedload(Chapter.class_obj))
+        .filter_by(id=test_id)
+        .first_or_404()
+    )
+
+
 # ================================
 # ✅ MANAGE TEST
 # ================================
 @teacher_bp.route("/test/<int:test_id>/manage", methods=["GET", "POST"])
 @login_required
 def manage_test(test_id):
-    test_obj = Test.query.get_or_404(test_id)
-    class_obj = Class.query.get(test_obj.chapter.class_id)
+    test_obj = _load_test_with_class(test_id)
+    class_obj = test_obj.chapter.class_obj
     if class_obj.teacher_id != current_user.id:
         flash("Unauthorized access!", "danger")
         return redirect(url_for("teacher.dashboard"))
@@ -208,8 +234,15 @@ def manage_test(test_id):
 @teacher_bp.route("/question/<int:question_id>/delete", methods=["POST"])
 @login_required
 def delete_question(question_id):
-    question = Question.query.get_or_404(question_id)
-    class_obj = Class.query.get(question.test.chapter.class_id)
+    # The auth check walks question -> test -> chapter; load the chain in the
+    # same query instead of three lazy round trips
+    question = (
+        Question.query
+        .options(joinedload(Question.test).joinedload(Test.chapter).joinedload(Chapter.class_obj))
+        .filter_by(id=question_id)
+        .first_or_404()
+    )
+    class_obj = question.test.chapter.class_obj
     if class_obj.teacher_id != current_user.id:
         flash("Unauthorized action!", "danger")
         return redirect(url_for("teacher.dashboard"))
@@ -224,8 +257,13 @@ def delete_question(question_id):
 @teacher_bp.route("/question/<int:question_id>/edit", methods=["POST"])
 @login_required
 def edit_question(question_id):
-    question = Question.query.get_or_404(question_id)
-    class_obj = Class.query.get(question.test.chapter.class_id)
+    question = (
+        Question.query
+        .options(joinedload(Question.test).joinedload(Test.chapter).joinedload(Chapter.class_obj))
+        .filter_by(id=question_id)
+        .first_or_404()
+    )
+    class_obj = question.test.chapter.class_obj
     if class_obj.teacher_id != current_user.id:
         flash("Unauthorized action!", "danger")
         return redirect(url_for("teacher.dashboard"))
@@ -246,8 +284,8 @@ def edit_question(question_id):
 @teacher_bp.route("/test/<int:test_id>/delete", methods=["POST"])
 @login_required
 def delete_test(test_id):
-    test = Test.query.get_or_404(test_id)
-    class_obj = Class.query.get(test.chapter.class_id)
+    test = _load_test_with_class(test_id)
+    class_obj = test.chapter.class_obj
     if class_obj.teacher_id != current_user.id:
         flash("Unauthorized action!", "danger")
         return redirect(url_for("teacher.dashboard"))
@@ -288,41 +326,57 @@ def class_students(class_id):
 
     students = (
         db.session.query(User)
+        .options(load_only(User.id, User.name, User.email))
         .join(StudentClass)
         .filter(StudentClass.class_id == class_id, User.role == "student")
         .all()
     )
 
-    student_analytics = []
-    for student in students:
-        attempts = (
-            db.session.query(TestAttempt)
-            .join(Test)
-            .join(Chapter)
-            .filter(TestAttempt.student_id == student.id, Chapter.class_id == class_id)
-            .all()
+    # Distinct (student, correctness, topic) rows in one query; DISTINCT in
+    # the database replaces the per-student answer loops and set() dedupe.
+    topic_rows = (
+        db.session.query(TestAttempt.student_id, StudentAnswer.is_correct, Question.topic)
+        .select_from(StudentAnswer)
+        .join(Question, StudentAnswer.question_id == Question.id)
+        .join(TestAttempt, StudentAnswer.attempt_id == TestAttempt.id)
+        .join(Test, TestAttempt.test_id == Test.id)
+        .join(Chapter)
+        .filter(Chapter.class_id == class_id, Question.topic.isnot(None))
+        .distinct()
+        .all()
+    )
+    weak_by_student, strong_by_student = {}, {}
+    for student_id, is_correct, topic in topic_rows:
+        bucket = strong_by_student if is_correct else weak_by_student
+        bucket.setdefault(student_id, []).append(topic)
+
+    # Attempt counts and score sums for every student in one grouped query
+    # instead of a TestAttempt fetch per student
+    attempt_stats = {
+        student_id: (attempt_count, total_score or 0)
+        for student_id, attempt_count, total_score in db.session.query(
+            TestAttempt.student_id,
+            db.func.count(TestAttempt.id),
+            db.func.sum(TestAttempt.score),
         )
+        .join(Test)
+        .join(Chapter)
+        .filter(Chapter.class_id == class_id)
+        .group_by(TestAttempt.student_id)
+        .all()
+    }
 
-        total_attempts = len(attempts)
-        total_score = sum(a.score for a in attempts if a.score is not None)
+    student_analytics = []
+    for student in students:
+        total_attempts, total_score = attempt_stats.get(student.id, (0, 0))
         avg_score = round(total_score / total_attempts, 2) if total_attempts else 0
 
-        weak_topics, strong_topics = [], []
-
-        for attempt in attempts:
-            for ans in attempt.answers:
-                if ans.question and ans.question.topic:
-                    if ans.is_correct:
-                        strong_topics.append(ans.question.topic.name)
-                    else:
-                        weak_topics.append(ans.question.topic.name)
-
         student_analytics.append({
             "student": student,
             "total_attempts": total_attempts,
             "avg_score": avg_score,
-            "weak_topics": list(set(weak_topics)),
-            "strong_topics": list(set(strong_topics))
+            "weak_topics": weak_by_student.get(student.id, []),
+            "strong_topics": strong_by_student.get(student.id, [])
         })
 
     return render_template(
@@ -334,23 +388,37 @@ def class_students(class_id):
 # ================================
 # 📊 ANALYTICS HELPERS
 # ================================
-def get_test_analytics(test_id):
-    """Compute average, highest, lowest score for a test."""
-    attempts = TestAttempt.query.filter_by(test_id=test_id).all()
-    if not attempts:
-        return {"avg": 0, "highest": 0, "lowest": 0, "count": 0}
+def bulk_test_analytics(test_ids):
+    """Compute avg/highest/lowest/count per test in one grouped query."""
+    stats = {tid: {"avg": 0, "highest": 0, "lowest": 0, "count": 0} for tid in test_ids}
+    if not test_ids:
+        return stats
+
+    rows = (
+        db.session.query(
+            TestAttempt.test_id,
+            db.func.avg(TestAttempt.score),
+            db.func.max(TestAttempt.score),
+            db.func.min(TestAttempt.score),
+            db.func.count(TestAttempt.score),
+        )
+        .filter(TestAttempt.test_id.in_(test_ids), TestAttempt.score.isnot(None))
+        .group_by(TestAttempt.test_id)
+        .all()
+    )
+    for test_id, avg, highest, lowest, count in rows:
+        stats[test_id] = {
+            "avg": round(avg, 2) if avg is not None else 0,
+            "highest": highest or 0,
+            "lowest": lowest or 0,
+            "count": count,
+        }
+    return stats
 
-    scores = [a.score for a in attempts if a.score is not None]
-    if not scores:
-        return {"avg": 0, "highest": 0, "lowest": 0, "count": len(attempts)}
 
-    avg_score = round(sum(scores) / len(scores), 2)
-    return {
-        "avg": avg_score,
-        "highest": max(scores),
-        "lowest": min(scores),
-        "count": len(scores)
-    }
+def get_test_analytics(test_id):
+    """Compute average, highest, lowest score for a test."""
+    return bulk_test_analytics([test_id])[test_id]
 
 
 def get_chapter_analytics(chapter_id):
@@ -359,9 +427,8 @@ def get_chapter_analytics(chapter_id):
     if not tests:
         return {"avg": 0, "lowest_test": None, "total_tests": 0}
 
-    test_scores = {
-        test.name: get_test_analytics(test.id)["avg"] for test in tests
-    }
+    stats = bulk_test_analytics([t.id for t in tests])
+    test_scores = {test.name: stats[test.id]["avg"] for test in tests}
 
     valid_scores = [v for v in test_scores.values() if v > 0]
     if not valid_scores:
@@ -383,43 +450,58 @@ def class_analytics(class_id):
         flash("Unauthorized access!", "danger")
         return redirect(url_for("teacher.dashboard"))
 
+    # Only id/name are rendered here; skip the wide columns entirely
     students = (
-        db.session.query(User)
+        db.session.query(User.id, User.name)
         .join(StudentClass)
         .filter(StudentClass.class_id == class_id, User.role == "student")
         .all()
     )
 
-    tests = (
-        db.session.query(Test)
+    # Let the database do the reduction: one grouped count over wrong answers
+    # instead of walking every attempt's answer collection in Python.
+    weak_topics = dict(
+        db.session.query(Question.topic, db.func.count())
+        .select_from(StudentAnswer)
+        .join(Question, StudentAnswer.question_id == Question.id)
+        .join(TestAttempt, StudentAnswer.attempt_id == TestAttempt.id)
+        .join(Test, TestAttempt.test_id == Test.id)
         .join(Chapter)
-        .filter(Chapter.class_id == class_id)
+        .filter(
+            Chapter.class_id == class_id,
+            StudentAnswer.is_correct == False,
+            Question.topic.isnot(None),
+        )
+        .group_by(Question.topic)
         .all()
     )
 
-    total_score, total_attempts = 0, 0
-    weak_topics = {}
-
-    for test in tests:
-        attempts = TestAttempt.query.filter_by(test_id=test.id).all()
-        for attempt in attempts:
-            if attempt.score:
-                total_score += attempt.score
-                total_attempts += 1
-            for ans in attempt.answers:
-                if not ans.is_correct and ans.question and ans.question.topic:
-                    topic_name = ans.question.topic.name
-                    weak_topics[topic_name] = weak_topics.get(topic_name, 0) + 1
+    # Class average in one aggregate round trip — no attempt rows cross the
+    # wire at all. score != 0 keeps parity with the old truthiness check.
+    total_score, total_attempts = (
+        db.session.query(db.func.sum(TestAttempt.score), db.func.count(TestAttempt.id))
+        .join(Test)
+        .join(Chapter)
+        .filter(
+            Chapter.class_id == class_id,
+            TestAttempt.score.isnot(None),
+            TestAttempt.score != 0,
+        )
+        .one()
+    )
 
     avg_score = round(total_score / total_attempts, 2) if total_attempts else 0
     weakest_topic = max(weak_topics, key=weak_topics.get) if weak_topics else "N/A"
 
-    attempted_ids = [
-        a.student_id for a in db.session.query(TestAttempt)
+    # Only the ids are needed here; a distinct column scan beats loading
+    # whole attempt rows, and the set makes the membership checks O(1)
+    attempted_ids = {
+        row[0]
+        for row in db.session.query(TestAttempt.student_id)
         .join(Test).join(Chapter)
         .filter(Chapter.class_id == class_id)
         .distinct()
-    ]
+    }
     not_attempted_students = [s.name for s in students if s.id not in attempted_ids]
 
     return render_template(
@@ -434,107 +516,183 @@ def class_analytics(class_id):
 # ================================
 # 🧩 DETAILED TEST REPORT HELPERS
 # ================================
-from sqlalchemy.orm import aliased
-
 def find_weakest_topic(test_id):
+    """Most-missed topic for a test, counted and ranked inside the database."""
     try:
-        QuestionAlias = aliased(Question)
-        answers = (
-            StudentAnswer.query
-            .join(QuestionAlias, StudentAnswer.question_id == QuestionAlias.id)
-            .filter(StudentAnswer.test_id == test_id, StudentAnswer.is_correct == False)
-            .all()
+        return (
+            db.session.query(Question.topic)
+            .select_from(StudentAnswer)
+            .join(Question, StudentAnswer.question_id == Question.id)
+            .join(TestAttempt, StudentAnswer.attempt_id == TestAttempt.id)
+            .filter(
+                TestAttempt.test_id == test_id,
+                StudentAnswer.is_correct == False,
+                Question.topic.isnot(None),
+            )
+            .group_by(Question.topic)
+            .order_by(db.func.count().desc())
+            .limit(1)
+            .scalar()
         )
-
-        if not answers:
-            return None
-
-        topic_count = {}
-        for ans in answers:
-            if ans.question and ans.question.topic:
-                topic = ans.question.topic.name
-                topic_count[topic] = topic_count.get(topic, 0) + 1
-
-        weakest_topic = max(topic_count, key=topic_count.get) if topic_count else None
-        return weakest_topic
     except Exception as e:
         print(f"⚠️ Weakest topic computation failed: {e}")
         return None
 
 
-from collections import Counter
+def attempt_score_map(attempt_ids):
+    """Marks obtained and percent per attempt, aggregated in one query.
+
+    Returns {attempt_id: (obtained_marks, percent)}; attempts with no
+    answers simply don't appear in the map.
+    """
+    if not attempt_ids:
+        return {}
+
+    marks = db.func.coalesce(Question.marks, 1)
+    rows = (
+        db.session.query(
+            StudentAnswer.attempt_id,
+            db.func.sum(marks),
+            db.func.sum(db.case((StudentAnswer.is_correct, marks), else_=0)),
+        )
+        .join(Question, Question.id == StudentAnswer.question_id)
+        .filter(StudentAnswer.attempt_id.in_(attempt_ids))
+        .group_by(StudentAnswer.attempt_id)
+        .all()
+    )
+    return {
+        attempt_id: (
+            obtained or 0,
+            round(((obtained or 0) / total) * 100, 2) if total else 0,
+        )
+        for attempt_id, total, obtained in rows
+    }
+
 
 def calculate_student_score(attempt_id):
     """
     Calculate a student's test score based on correct answers and question marks.
     Returns (obtained_marks, percent).
     """
-    attempt = TestAttempt.query.get(attempt_id)
-    if not attempt:
-        return 0, 0
-
-    answers = StudentAnswer.query.filter_by(attempt_id=attempt_id).all()
-    if not answers:
-        return 0, 0
+    return attempt_score_map([attempt_id]).get(attempt_id, (0, 0))
+
+
+# The detailed report is recomputed on every page view even though the
+# underlying rows change rarely between refreshes. Cache it per process,
+# keyed by a cheap freshness token over the tables the report reads; the
+# short TTL caps staleness from writes the token can't see (e.g. a teacher
+# editing question marks).
+_report_cache = {}
+_report_cache_lock = threading.Lock()
+_REPORT_CACHE_TTL = 60
+
+
+def _report_freshness_token(test_id):
+    """Change marker for a test's answers and follow-ups, in two aggregates."""
+    answer_state = (
+        db.session.query(
+            db.func.count(StudentAnswer.id),
+            db.func.max(StudentAnswer.id),
+            db.func.sum(db.case((StudentAnswer.is_correct, 1), else_=0)),
+        )
+        .join(TestAttempt, StudentAnswer.attempt_id == TestAttempt.id)
+        .filter(TestAttempt.test_id == test_id)
+        .one()
+    )
+    followup_state = (
+        db.session.query(
+            db.func.count(FollowupAssignment.id),
+            db.func.sum(db.case((FollowupAssignment.is_attempted, 1), else_=0)),
+        )
+        .join(TestAttempt, FollowupAssignment.attempt_id == TestAttempt.id)
+        .filter(TestAttempt.test_id == test_id)
+        .one()
+    )
+    return tuple(answer_state) + tuple(followup_state)
 
-    total_marks = 0
-    obtained_marks = 0
 
-    for ans in answers:
-        question = Question.query.get(ans.question_id)
-        if not question:
-            continue
-        total_marks += question.marks or 1
-        if ans.is_correct:
-            obtained_marks += question.marks or 1
+def generate_detailed_test_report(test_id):
+    """Cached wrapper around the report builder; hits skip every report query."""
+    now = time.time()
+    token = _report_freshness_token(test_id)
+    with _report_cache_lock:
+        hit = _report_cache.get(test_id)
+        if hit and hit[0] == token and now - hit[1] < _REPORT_CACHE_TTL:
+            return hit[2]
 
-    percent = round((obtained_marks / total_marks) * 100, 2) if total_marks else 0
-    return obtained_marks, percent
+    report = _build_detailed_test_report(test_id)
+    with _report_cache_lock:
+        _report_cache[test_id] = (token, now, report)
+    return report
 
 
-def generate_detailed_test_report(test_id):
+def _build_detailed_test_report(test_id):
     """Generate detailed analytics for a test including score stats, weak topics, and improvement."""
-    test = Test.query.get_or_404(test_id)
-    class_obj = Class.query.get(test.chapter.class_id)
+    test = _load_test_with_class(test_id)
+    class_obj = test.chapter.class_obj
 
     # === Fetch students and attempts ===
+    # Everything this report needs arrives via the aggregate queries below;
+    # raiseload turns any future lazy-load regression into a loud error.
     students = (
         db.session.query(User)
+        .options(raiseload("*"))
         .join(StudentClass)
         .filter(StudentClass.class_id == class_obj.id, User.role == "student")
         .all()
     )
 
-    attempts = TestAttempt.query.filter_by(test_id=test.id).all()
+    attempts = (
+        TestAttempt.query
+        .options(raiseload("*"))
+        .filter_by(test_id=test.id)
+        .all()
+    )
     total_students = len(students)
-    attempted_ids = [a.student_id for a in attempts]
-    not_attempted = [s for s in students if s.id not in attempted_ids]
-
-    # === Recalculate all scores dynamically ===
-    for a in attempts:
-        obtained, percent = calculate_student_score(a.id)
-        a.score = obtained
-        a.percent = percent if hasattr(a, 'percent') else None
-    db.session.commit()
+    attempts_by_student = {a.student_id: a for a in attempts}
+    not_attempted = [s for s in students if s.id not in attempts_by_student]
+
+    # === Compute all scores in one aggregate (read-only: submission already
+    # persists attempt.score, so this GET no longer writes anything) ===
+    score_map = attempt_score_map([a.id for a in attempts])
+    obtained_by_attempt = {aid: obtained for aid, (obtained, _) in score_map.items()}
 
     # === Compute overall stats ===
-    scores = [((a.score or 0) / test.max_score) * 100 for a in attempts if test.max_score]
+    scores = [(obtained_by_attempt.get(a.id, 0) / test.max_score) * 100 for a in attempts if test.max_score]
     avg_score = round(sum(scores) / len(scores), 2) if scores else 0
 
-    highest_attempt = max(attempts, key=lambda a: a.score or 0, default=None)
-    lowest_attempt = min(attempts, key=lambda a: a.score or 0, default=None)
+    highest_attempt = max(attempts, key=lambda a: obtained_by_attempt.get(a.id, 0), default=None)
+    lowest_attempt = min(attempts, key=lambda a: obtained_by_attempt.get(a.id, 0), default=None)
 
-    highest_score = ((highest_attempt.score or 0) / test.max_score) * 100 if highest_attempt else 0
-    lowest_score = ((lowest_attempt.score or 0) / test.max_score) * 100 if lowest_attempt else 0
-    highest_scorer = User.query.get(highest_attempt.student_id) if highest_attempt else None
-    lowest_scorer = User.query.get(lowest_attempt.student_id) if lowest_attempt else None
+    highest_score = (obtained_by_attempt.get(highest_attempt.id, 0) / test.max_score) * 100 if highest_attempt and test.max_score else 0
+    lowest_score = (obtained_by_attempt.get(lowest_attempt.id, 0) / test.max_score) * 100 if lowest_attempt and test.max_score else 0
 
     # === Build detailed student reports ===
     student_reports = []
-    all_remaining_topics = []
+    student_ids = [s.id for s in students]
+
+    # Topic names for every follow-up these students hold, fetched once; the
+    # loop below reads from the dict instead of a Topic.query.get per row
+    topic_by_id = dict(
+        db.session.query(Topic.id, Topic.name)
+        .join(FollowupAssignment, FollowupAssignment.topic_id == Topic.id)
+        .filter(FollowupAssignment.student_id.in_(student_ids))
+        .distinct()
+    )
+
+    # One query per table for the whole class instead of two per student
+    followups_by_stu = {}
+    for f in FollowupAssignment.query.filter(FollowupAssignment.student_id.in_(student_ids)):
+        followups_by_stu.setdefault(f.student_id, []).append(f)
+
+    reviews_by_stu = {}
+    for r in StudentReview.query.filter(
+        StudentReview.student_id.in_(student_ids), StudentReview.test_id == test.id
+    ):
+        reviews_by_stu.setdefault(r.student_id, []).append(r)
 
     for student in students:
-        attempt = next((a for a in attempts if a.student_id == student.id), None)
+        attempt = attempts_by_student.get(student.id)
 
         # Not attempted
         if not attempt:
@@ -552,14 +710,18 @@ def generate_detailed_test_report(test_id):
             continue
 
         # === Compute actual score ===
-        obtained, percent = calculate_student_score(attempt.id)
+        # Percent is persisted at submission; the aggregate is only the
+        # fallback for attempts that predate the column
+        obtained, percent = score_map.get(attempt.id, (0, 0))
+        if attempt.percent is not None:
+            percent = attempt.percent
 
         # === Weak topics ===
-        reviews = StudentReview.query.filter_by(student_id=student.id, test_id=test.id).all()
+        reviews = reviews_by_stu.get(student.id, [])
         weak_topics = [r.topic_name for r in reviews if r.topic_name] if reviews else []
 
         # === Follow-up performance ===
-        followups = FollowupAssignment.query.filter_by(student_id=student.id).all()
+        followups = followups_by_stu.get(student.id, [])
         followup_attempts = [f for f in followups if f.is_attempted]
         followup_score = 0
         if followup_attempts:
@@ -568,14 +730,11 @@ def generate_detailed_test_report(test_id):
             followup_score = round((correct_followup / total_followup) * 100, 2)
 
         # === Remaining Weak Topics ===
-        remaining_topics = []
-        for f in followup_attempts:
-            if not f.is_correct and f.topic_id:
-                topic = Topic.query.get(f.topic_id)
-                if topic:
-                    remaining_topics.append(topic.name)
-        remaining_topics = list(set(remaining_topics))
-        all_remaining_topics.extend(remaining_topics)
+        remaining_topics = list({
+            topic_by_id[f.topic_id]
+            for f in followup_attempts
+            if not f.is_correct and f.topic_id in topic_by_id
+        })
 
         # === Improvement ===
         improvement = round(followup_score - percent, 2)
@@ -608,6 +767,7 @@ def generate_detailed_test_report(test_id):
 
         student_reports.append({
             "student": student.name,
+            "student_id": student.id,
             "score": percent,
             "percent": percent,
             "weak_topics": weak_topics or ["-"],
@@ -623,8 +783,41 @@ def generate_detailed_test_report(test_id):
     highest_improvement = max(improvements, key=lambda x: x["improvement"], default=None)
     lowest_improvement = min(improvements, key=lambda x: x["improvement"], default=None)
 
+    # All four summary users in one IN-query, keyed by id (names aren't
+    # guaranteed unique, and per-name lookups were a scan each)
+    summary_ids = {
+        uid
+        for uid in (
+            highest_attempt.student_id if highest_attempt else None,
+            lowest_attempt.student_id if lowest_attempt else None,
+            highest_improvement["student_id"] if highest_improvement else None,
+            lowest_improvement["student_id"] if lowest_improvement else None,
+        )
+        if uid is not None
+    }
+    users_by_id = (
+        {u.id: u for u in User.query.filter(User.id.in_(summary_ids))}
+        if summary_ids else {}
+    )
+    highest_scorer = users_by_id.get(highest_attempt.student_id) if highest_attempt else None
+    lowest_scorer = users_by_id.get(lowest_attempt.student_id) if lowest_attempt else None
+
     # === Weakest topic overall ===
-    topic_counter = Counter(t for t in all_remaining_topics if t not in ["No Weak Topics 🎯", "-"])
+    # How many students still miss each topic, counted in the database
+    # (DISTINCT replaces the per-student dedupe the Python Counter relied on)
+    topic_counter = dict(
+        db.session.query(
+            Topic.name, db.func.count(db.func.distinct(FollowupAssignment.student_id))
+        )
+        .join(FollowupAssignment, FollowupAssignment.topic_id == Topic.id)
+        .filter(
+            FollowupAssignment.student_id.in_(student_ids),
+            FollowupAssignment.is_attempted == True,
+            FollowupAssignment.is_correct == False,
+        )
+        .group_by(Topic.name)
+        .all()
+    )
     if topic_counter:
         max_freq = max(topic_counter.values())
         weakest_topics = [t for t, freq in topic_counter.items() if freq == max_freq]
@@ -646,8 +839,8 @@ def generate_detailed_test_report(test_id):
             "lowest_scorer": lowest_scorer,
             "highest_improvement": highest_improvement["improvement_display"] if highest_improvement else None,
             "lowest_improvement": lowest_improvement["improvement_display"] if lowest_improvement else None,
-            "highest_improvement_student": User.query.filter_by(name=highest_improvement["student"]).first() if highest_improvement else None,
-            "lowest_improvement_student": User.query.filter_by(name=lowest_improvement["student"]).first() if lowest_improvement else None,
+            "highest_improvement_student": users_by_id.get(highest_improvement["student_id"]) if highest_improvement else None,
+            "lowest_improvement_student": users_by_id.get(lowest_improvement["student_id"]) if lowest_improvement else None,
         },
         "students": student_reports,
         "not_attempted_students": [s.name for s in not_attempted],
@@ -661,8 +854,8 @@ def generate_detailed_test_report(test_id):
 @login_required
 def test_analytics(test_id):
     """Detailed analytics dashboard for a test."""
-    test = Test.query.get_or_404(test_id)
-    class_obj = Class.query.get(test.chapter.class_id)
+    test = _load_test_with_class(test_id)
+    class_obj = test.chapter.class_obj
 
     # ✅ Authorization check
     if class_obj.teacher_id != current_user.id: